@@ -0,0 +1,114 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prompt_parser import parse_world_prompt
+
+# A local stand-in for the OpenAI chat completions endpoint, for trying out
+# batch_extract.py (or anything else that takes a base URL) without a key,
+# network or cost. Answers come from the offline prompt_parser after a fixed
+# latency, and a share of requests can be made to fail with 429/500 to
+# exercise the retries. Streamed requests ("stream": true) get the answer a few
+# characters at a time, spread over the latency like a model writing it out.
+#
+#   python chat_stand_in.py --port 8000 --latency 0.5 --failure-rate 0.1
+#   python batch_extract.py prompts.txt --base-url http://127.0.0.1:8000/v1
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+    failure_rate = 0.0
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = next((message["content"] for message in reversed(request.get("messages", []))
+                       if message.get("role") == "user"), "")
+
+        stream = request.get("stream", False)
+        if not stream:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            status = random.choice([429, 500])
+            self.send_json(status, {"error": {"message": "Stand-in failure", "type": "server_error"}})
+            return
+
+        world_data, _ = parse_world_prompt(prompt)
+        content = json.dumps(world_data)
+        completion = {"id": f"chatcmpl-stand-in-{random.getrandbits(32):08x}",
+                      "created": int(time.time()),
+                      "model": request.get("model", "stand-in")}
+        if stream:
+            self.send_stream(completion, content)
+            return
+        self.send_json(200, {
+            **completion,
+            "object": "chat.completion",
+            "choices": [{"index": 0,
+                         "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    # Server-sent events, one chat.completion.chunk per few characters.
+    def send_stream(self, completion, content, chunk_size=4):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        for i, piece in enumerate(pieces):
+            time.sleep(self.latency / len(pieces))
+            chunk = {**completion,
+                     "object": "chat.completion.chunk",
+                     "choices": [{"index": 0,
+                                  "delta": {"role": "assistant", "content": piece} if i == 0 else {"content": piece},
+                                  "finish_reason": "stop" if i == len(pieces) - 1 else None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass # one line per request drowns everything else out
+
+
+# Starts the stand-in on a background thread and returns the server, its URL
+# is f"http://127.0.0.1:{server.server_port}/v1". Port 0 picks a free one.
+# Call server.shutdown() when done.
+def start_stand_in(port=0, latency=0.5, failure_rate=0.0):
+    handler = type("StandInHandler", (ChatCompletionsHandler,), {"latency": latency, "failure_rate": failure_rate})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the chat completions endpoint.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds every request takes.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with a 429 or 500.")
+    args = parser.parse_args()
+
+    server = start_stand_in(args.port, args.latency, args.failure_rate)
+    print(f"Chat completions stand-in listening on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import numpy as np
 import random
 from biome_mask import create_biome_mask
-from world_config import Biome, MapSizes
+from world_config import Biome, MapSizes, map_dimensions
 from utility_methods import print_grid
 
 # ! do i still need this
@@ -32,81 +32,222 @@ biome_height_offsets = {
 }
 
 # Do diamond square map gen with respect to the biome mask.
-def generate_heightmap_w_biome_mask(size, biome_mask, base_roughness=0.5, base_height_offset=0.1, seed=None):
+# The roughness and height offset for each cell are looked up once from the 
+# biome mask, then every pass runs over whole arrays instead of cell by cell.
+# exact=True (the default) gives the same heightmap as the old per-cell loop for 
+# a given seed. exact=False swaps in the textbook square step, which is pure 
+# strided slices, but heights climb by the biome offset on every level so the
+# ASCII thresholds will need retuning before it is used for real worlds.
+# size is a side length or a (width, height) tuple and doesn't need to be 2^n + 1.
+# fixed_heights is an optional array shaped like the map, any cell that isn't 
+# NaN keeps that height on every level (used to pin chunk borders).
+def generate_heightmap_w_biome_mask(size, biome_mask, base_roughness=0.5, base_height_offset=0.1, seed=None, exact=True, fixed_heights=None):
+    for _, height_map in generate_heightmap_levels(size, biome_mask, base_roughness, base_height_offset, seed, exact, fixed_heights):
+        pass
+    return height_map
+
+
+# Same as generate_heightmap_w_biome_mask, but yields (step, heights) for every
+# level of detail on the way, coarsest first. heights[i, j] is the height of map 
+# cell (i * step, j * step) and the last level (step = 1) is the full heightmap.
+# Points never move once they're placed, so each level is exactly the strided
+# view height_map[::step, ::step] of the finished map.
+def generate_heightmap_levels(size, biome_mask, base_roughness=0.5, base_height_offset=0.1, seed=None, exact=True, fixed_heights=None):
     if seed:
         print(f"Generating heightmap with seed = ", seed)
         rng = np.random.default_rng(seed)
     else:       
         rng = np.random.default_rng()
-    grid = np.zeros((size, size))
-    print(f"size = {size}")
+    width, height = map_dimensions(size)
+    print(f"size = {width}x{height}")
+    
+    if fixed_heights is not None:
+        fixed_heights = fixed_heights[None]
+    levels = heightmap_stack_levels(size, biome_mask[None], [rng], base_roughness, base_height_offset, exact, fixed_heights)
+    for step, grid in levels:
+        # Drop the lattice points that only sit past the map edge
+        yield step, grid[0, :-(-height // step), :-(-width // step)]
+
+
+# Generates a stack of heightmaps in one go. biome_masks is (N, height, width) 
+# and there is one rng per world, every pass then runs over the whole stack. 
+# Each world comes out the same as it would on its own with the same rng.
+def generate_heightmap_stack(size, biome_masks, rngs, base_roughness=0.5, base_height_offset=0.1, exact=True, fixed_heights=None):
+    for _, grid in heightmap_stack_levels(size, biome_masks, rngs, base_roughness, base_height_offset, exact, fixed_heights):
+        pass
+    return grid
+
+
+# Yields (step, grid) after the corners and after every level of 
+# generate_heightmap_stack. Grids can run one lattice point past the map edge.
+def heightmap_stack_levels(size, biome_masks, rngs, base_roughness=0.5, base_height_offset=0.1, exact=True, fixed_heights=None):
+    width, height = map_dimensions(size)
+    roughness, height_offset = biome_param_grids(biome_masks, base_roughness, base_height_offset)
+    
+    # The map sits in the top left of a single 2^n + 1 tile, but each level 
+    # only keeps the lattice points that cover the map. Nothing past the map 
+    # edge is generated apart from one row/column that the next level refines 
+    # towards. For 2^n + 1 squares this is the whole tile, same as before.
+    step_size = 1 << (max(width, height, 2) - 2).bit_length() # start big, then get smaller.
     
     # Init corners
-    grid[0, 0] = grid[0, -1] = grid[-1, 0] = grid[-1, -1] = rng.uniform(0, 1)
+    grid = np.empty((len(rngs), lattice_length(height, step_size), lattice_length(width, step_size)))
+    grid[:] = np.array([rng.uniform(0, 1) for rng in rngs])[:, None, None]
+    pin_heights(grid, level_fixed_heights(fixed_heights, grid.shape, step_size))
+    yield step_size, grid
 
-    step_size = size - 1 # start big, then get smaller.
-    iteration_num = 1
     while step_size > 1:
         half_step = step_size // 2
         
-        # Check the biome map and then perform the diamond & square steps with the 
-        # parameters for that biome
-        # Diamond Step
-        for x in range (0, size - 1, step_size):
-            for y in range(0, size - 1, step_size):
-                biome = biome_mask[x + half_step, y + half_step]
-                roughness = biome_roughness.get(Biome(biome), base_roughness)
-                biome_height_offset = biome_height_offsets.get(Biome(biome), base_height_offset)
-                diamond_step(grid, x, y, step_size, roughness, biome_height_offset, rng)
-                
-        # Square step
-        for x in range(0, size, half_step):
-            for y in range((x + half_step) % step_size, size, step_size):
-                biome = biome_mask[x % size, y % size] # use mod to stay in bounds
-                roughness = biome_roughness.get(Biome(biome), base_roughness)
-                biome_height_offset = biome_height_offsets.get(Biome(biome), base_height_offset)
-                square_step(grid, x, y, step_size, roughness, size,  biome_height_offset, rng)
+        # Spread the points out to half a step apart, then fill in the gaps
+        lattice = grid
+        grid = np.zeros((len(rngs), 2 * lattice.shape[1] - 1, 2 * lattice.shape[2] - 1))
+        grid[:, ::2, ::2] = lattice
+        
+        # Lattice points past the map edge take the biome of the nearest edge cell
+        ys = np.minimum(np.arange(grid.shape[1]) * half_step, height - 1)[:, None]
+        xs = np.minimum(np.arange(grid.shape[2]) * half_step, width - 1)[None, :]
+        level_roughness = roughness[:, ys, xs]
+        level_height_offset = height_offset[:, ys, xs]
+        level_fixed = level_fixed_heights(fixed_heights, grid.shape, half_step)
+        
+        diamond_pass(grid, 2, level_roughness, level_height_offset, rngs)
+        pin_heights(grid, level_fixed)
+        if exact:
+            square_pass(grid, 2, level_roughness, level_height_offset, rngs, fixed=level_fixed)
+        else:
+            fast_square_pass(grid, 2, level_roughness, level_height_offset, rngs)
+            pin_heights(grid, level_fixed)
+        grid = np.ascontiguousarray(grid[:, :lattice_length(height, half_step), :lattice_length(width, half_step)])
         
         # Cut the step size in half
         step_size = half_step
-        iteration_num += 1
+        yield step_size, grid
         
         # Normalize array - 
         # Ashley: I'm still looking into how normalization impacts the final outcome. 
         # min_val = np.min(grid)
         # max_val = np.max(grid)
         # grid = (grid - min_val) / (max_val - min_val)
-    return grid
 
 
-def diamond_step(grid, x, y, step, roughness, biome_height_offset, rng):
+# Number of lattice points, spaced step apart, needed to cover length cells.
+def lattice_length(length, step):
+    return -(-(length - 1) // step) + 1
+
+
+# Picks out the fixed heights that land on the lattice points of a level.
+def level_fixed_heights(fixed_heights, shape, step):
+    if fixed_heights is None:
+        return None
+    level_fixed = np.full(shape, np.nan)
+    on_lattice = fixed_heights[..., ::step, ::step][..., :shape[-2], :shape[-1]]
+    level_fixed[..., :on_lattice.shape[-2], :on_lattice.shape[-1]] = on_lattice
+    return level_fixed
+
+
+def pin_heights(grid, fixed):
+    if fixed is not None:
+        np.copyto(grid, fixed, where=~np.isnan(fixed))
+
+
+# Builds per-cell roughness and height offset arrays by indexing lookup tables 
+# with the biome mask codes. Biomes missing from the dicts fall back to the 
+# base values.
+def biome_param_grids(biome_mask, base_roughness, base_height_offset):
+    roughness_lut = np.array([biome_roughness.get(biome, base_roughness) for biome in Biome])
+    height_offset_lut = np.array([biome_height_offsets.get(biome, base_height_offset) for biome in Biome])
+    return roughness_lut[biome_mask], height_offset_lut[biome_mask]
+
+
+# Draws the uniform(-roughness, roughness) noise for a block of cells. This 
+# consumes the rng stream in the same order as one rng.uniform call per cell.
+def displacement(rng, roughness):
+    return -roughness + (roughness - -roughness) * rng.random(roughness.shape)
+
+
+# displacement() for a stack of worlds, each world draws from its own rng.
+def stack_displacement(rngs, roughness):
+    return np.stack([displacement(rng, world_roughness) for rng, world_roughness in zip(rngs, roughness)])
+
+
+# The passes below work on (N, rows, cols) stacks, one world per rng.
+def diamond_pass(grid, step, roughness, height_offset, rngs):
     # Take the average value of the 4 corners and assign it to the point in the 
-    # middle of the diamond. 
-    # if seed:
-    #     random.seed(seed)
+    # middle of each diamond. 
+    half = step // 2
+    avg = (grid[:, :-1:step, :-1:step] + grid[:, step::step, :-1:step] + grid[:, :-1:step, step::step] + grid[:, step::step, step::step]) / 4.0
+    centers = (slice(None), slice(half, None, step), slice(half, None, step))
+    grid[centers] = avg + stack_displacement(rngs, roughness[centers]) + height_offset[centers]
+    
+    
+def fast_square_pass(grid, step, roughness, height_offset, rngs):
+    # Take the average of the 3-4 points that sit half a step away from each 
+    # edge midpoint in the 4 cardinal directions. These are all corners and 
+    # diamond centers, so both sets of midpoints can be filled in at once.
+    half = step // 2
+    
+    # Midpoints on the corner rows (x is a multiple of step)
+    rows = (slice(None), slice(None, None, step), slice(half, None, step))
+    total = grid[:, ::step, :-1:step] + grid[:, ::step, step::step]
+    count = np.full(total.shape[1:], 2.0)
+    total[:, 1:] += grid[:, half::step, half::step]
+    count[1:] += 1
+    total[:, :-1] += grid[:, half::step, half::step]
+    count[:-1] += 1
+    grid[rows] = total / count + stack_displacement(rngs, roughness[rows]) + height_offset[rows]
+    
+    # Midpoints on the diamond center rows (x is an odd multiple of half)
+    cols = (slice(None), slice(half, None, step), slice(None, None, step))
+    total = grid[:, :-1:step, ::step] + grid[:, step::step, ::step]
+    count = np.full(total.shape[1:], 2.0)
+    total[:, :, 1:] += grid[:, half::step, half::step]
+    count[:, 1:] += 1
+    total[:, :, :-1] += grid[:, half::step, half::step]
+    count[:, :-1] += 1
+    grid[cols] = total / count + stack_displacement(rngs, roughness[cols]) + height_offset[cols]
+
+
+def square_pass(grid, step, roughness, height_offset, rngs, fixed=None):
+    # The square step averages the neighbors a full step away (not half a 
+    # step), which are other square points from the same pass. Points used to 
+    # be filled in row by row, so each one only sees the left and top neighbors 
+    # that were already written and the right and bottom ones are still 0.
+    # Every point on an anti-diagonal only depends on the one before it, so we 
+    # sweep the diagonals to keep the old values exactly.
+    worlds, rows, cols = grid.shape
+    half = step // 2
+    
+    # Noise is drawn in the old visiting order, row by row.
+    x = np.arange(rows)[:, None]
+    y = np.arange(cols)[None, :]
+    square_points = (x % half == 0) & (y % half == 0) & ((x // half + y // half) % 2 == 1)
+    noise = np.zeros(grid.shape)
+    noise[:, square_points] = stack_displacement(rngs, roughness[:, square_points])
+    
+    # The two sets of square points never read each other.
+    for points in [(slice(None, None, step), slice(half, None, step)), (slice(half, None, step), slice(None, None, step))]:
+        x = np.arange(rows)[points[0]][:, None]
+        y = np.arange(cols)[points[1]][None, :]
+        count = ((x - step >= 0) * 1.0 + (x + step < rows) + (y - step >= 0) + (y + step < cols))
+        count[count == 0] = 1 # only happens on one cell wide maps
+        points = (slice(None),) + points
+        u = noise[points]
+        offset = height_offset[points]
+        pins = fixed[points] if fixed is not None else None
         
-    avg = (grid[x, y] + grid[x + step, y] + grid[x, y + step] + grid[x + step, y + step]) / 4.0
-    grid[x + step // 2, y + step // 2] = avg + rng.uniform(-roughness, roughness) + biome_height_offset
-    
-    
-def square_step(grid, x, y, step, roughness, map_size, biome_height_offset, rng):
-    # Take the average of the 3-4 points that point out from the point 
-    # computed in the diamond step in the 4 cardinal directions. These points 
-    # will be the average of all points that surround them in the 4 cardinal directions.
-    # if seed:
-    #     random.seed(seed)
-    
-    neighbors = []
-    if x - step >= 0: # get left pt
-        neighbors.append(grid[x - step, y])
-    if x + step < map_size: # get right pt
-        neighbors.append(grid[x + step, y])
-    if y - step >= 0: # get top pt
-        neighbors.append(grid[x, y - step])
-    if y + step < map_size: # get bottom pt
-        neighbors.append(grid[x, y + step])
-    avg = np.mean(neighbors)
-    grid[x, y] = avg + rng.uniform(-roughness, roughness) + biome_height_offset
+        # Padded with a row and column of zeros for the missing neighbors
+        n, m = u.shape[1:]
+        filled = np.zeros((worlds, n + 1, m + 1))
+        for d in range(n + m - 1):
+            i = np.arange(max(0, d - m + 1), min(d, n - 1) + 1)
+            j = d - i
+            avg = (filled[:, i, j + 1] + filled[:, i + 1, j]) / count[i, j]
+            filled[:, i + 1, j + 1] = avg + u[:, i, j] + offset[:, i, j]
+            if pins is not None:
+                # Pinned points keep their height so the points after them read it
+                filled[:, i + 1, j + 1] = np.where(np.isnan(pins[:, i, j]), filled[:, i + 1, j + 1], pins[:, i, j])
+        grid[points] = filled[:, 1:, 1:]
 
 
 # Generates a heightmap using the Diamond Square algorithim
@@ -149,25 +290,35 @@ def generate_heightmap(size, roughness, seed=None):
 
 
 # Smooth out the biomes to make them less blocky
+# Each cell becomes the average height of the cells within smoothing_radius 
+# that share its biome. The window sums come from running sums (one pair per 
+# biome), so the cost does not grow with the radius. Also takes (N, rows, cols) 
+# stacks of masks and heightmaps.
 def smooth_biome_transitions(biome_mask, height_map, smoothing_radius=1):
-    size = biome_mask.shape[0]
     smoothed_height_map = height_map.copy() # prep the output map
     
-    for y in range(size):
-        for x in range(size):
-            # Collect neighboring heights and biome types
-            heights = []
-            for dy in range(-smoothing_radius, smoothing_radius + 1):
-                for dx in range(-smoothing_radius, smoothing_radius + 1):
-                    ny, nx = y + dy, x + dx
-                    if 0 <= ny < size and 0 <= nx < size:
-                        if biome_mask[ny][nx] == biome_mask[y][x]:
-                            heights.append(height_map[ny][nx])
-            # Average height for smoothing
-            if heights:
-                smoothed_height_map[y][x] = sum(heights) / len(heights)
+    for biome in np.flatnonzero(np.bincount(biome_mask.ravel())):
+        same_biome = biome_mask == biome
+        heights = box_sum(np.where(same_biome, height_map, 0.0), smoothing_radius)
+        counts = box_sum(same_biome.astype(float), smoothing_radius)
+        np.divide(heights, counts, out=smoothed_height_map, where=same_biome)
     return smoothed_height_map
 
+
+# Sums the (2 * radius + 1)^2 window around every cell, clipped at the map edges.
+# The window is separable, so this takes a running sum down the rows, then 
+# swaps the last two axes and does the same for the columns. Any leading axes 
+# (e.g. a stack of maps) are carried along.
+def box_sum(values, radius):
+    for _ in range(2):
+        rows = values.shape[-2]
+        running = np.zeros(values.shape[:-2] + (rows + 1, values.shape[-1]))
+        np.cumsum(values, axis=-2, out=running[..., 1:, :])
+        top = np.clip(np.arange(rows) - radius, 0, rows)
+        bottom = np.clip(np.arange(rows) + radius + 1, 0, rows)
+        values = np.swapaxes(running[..., bottom, :] - running[..., top, :], -1, -2)
+    return values
+
 def enforce_generation_rules():
     pass
 
@@ -0,0 +1,102 @@
+import json
+
+# Incremental parser for a JSON object that arrives in pieces, like a streamed
+# LLM completion. Every top level field is handed back as soon as its value is
+# complete, so {"biomes": {...}, "seed": ...} gives up "biomes" the moment its
+# closing brace arrives, while the rest of the object is still on its way.
+#
+#   fields = JSONFieldStream()
+#   for chunk in chunks:
+#       for key, value in fields.feed(chunk):
+#           ...
+#   world_data = fields.value()
+#
+# Anything before the first '{' (e.g. a ```json fence) is skipped.
+class JSONFieldStream():
+
+    def __init__(self):
+        self.text = ""
+        self.position = 0         # next character to look at
+        self.object_start = None  # index of the top level '{'
+        self.object_end = None    # index just past the matching '}'
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+        self.fields = {}
+
+    @property
+    def done(self):
+        return self.object_end is not None
+
+    # Adds chunk and returns [(key, value)] for the fields it completed.
+    def feed(self, chunk):
+        self.text += chunk
+        completed = []
+        text = self.text
+        for i in range(self.position, len(text)):
+            if self.done:
+                break
+            c = text[i]
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        if self.value_start is None:
+                            self.key = json.loads(text[self.key_start:i + 1])
+                        else:
+                            self.complete_field(i + 1, completed) # string value
+                continue
+
+            if self.object_start is None:
+                if c == "{":
+                    self.object_start = i
+                    self.depth = 1
+                continue
+
+            if c == '"':
+                self.in_string = True
+                if self.depth == 1 and self.value_start is None:
+                    self.key_start = i
+            elif c == ":" and self.depth == 1:
+                self.value_start = i + 1
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 1:
+                    self.complete_field(i + 1, completed) # object or array value
+                elif self.depth == 0:
+                    self.complete_field(i, completed)     # number, true, false or null value
+                    self.object_end = i + 1
+            elif c == "," and self.depth == 1:
+                self.complete_field(i, completed)
+        self.position = len(text)
+        return completed
+
+    def complete_field(self, value_end, completed):
+        if self.key is None or self.value_start is None:
+            return
+        try:
+            value = json.loads(self.text[self.value_start:value_end])
+        except ValueError:
+            value = None # malformed, value() will fail on it too
+        else:
+            self.fields[self.key] = value
+            completed.append((self.key, value))
+        self.key = None
+        self.value_start = None
+
+    # The whole object. Raises ValueError until it has arrived, or if it isn't
+    # valid JSON.
+    def value(self):
+        if not self.done:
+            raise ValueError("JSON object is incomplete")
+        return json.loads(self.text[self.object_start:self.object_end])
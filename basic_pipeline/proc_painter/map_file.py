@@ -0,0 +1,122 @@
+import json
+import struct
+import numpy as np
+from ascii_tile import ASCIITile, terrain_tiles
+from tile_map import TileMap, as_tile_map
+
+# Binary map files (.ppmap), a lot smaller than the text export and quick to
+# load back for metrics or re-rendering.
+#
+#   magic      b"PPMAP" + a format version byte
+#   header     uint32 length + JSON: width, height, seed, biome params, palette,
+#              and where the tile codes and heights start
+#   tiles      (height, width) uint8 tile codes, one byte per tile
+#   heights    (height, width) float16 heights, only when they were saved
+#
+# Each block starts on a block_alignment byte boundary, so load_map can memory
+# map them straight from the file. Opening a map only reads the header, tiles
+# and heights are paged in from disk as they're used.
+map_magic = b"PPMAP"
+map_format_version = 1
+block_alignment = 64
+
+header_prefix = struct.Struct("<5sBI") # magic, version, header length
+
+
+def align(offset):
+    return -(-offset // block_alignment) * block_alignment
+
+
+# Saves world_map (a TileMap or a list of lists of ASCIITiles) to filename.
+# Heights are stored as float16, pass include_heights=False to leave them out.
+def save_map(world_map, filename="generated_map.ppmap", seed=None, biome_params=None, include_heights=True):
+    tile_map = as_tile_map(world_map)
+    heights = tile_map.heights if include_heights else None
+
+    header = {"width": tile_map.width,
+              "height": tile_map.height,
+              "seed": seed,
+              "biome_params": biome_params,
+              "palette": [[tile.raw_symbol, tile.color] for tile in tile_map.palette],
+              "tiles_offset": 0,
+              "heights_offset": None}
+
+    # The offsets depend on the header's own length, so lay it out with room
+    # for them first and then fill them in.
+    header_bytes = json.dumps(header).encode()
+    tiles_offset = align(header_prefix.size + len(header_bytes) + 64)
+    heights_offset = align(tiles_offset + tile_map.width * tile_map.height) if heights is not None else None
+    header["tiles_offset"] = tiles_offset
+    header["heights_offset"] = heights_offset
+    header_bytes = json.dumps(header).encode()
+
+    with open(filename, 'wb') as f:
+        f.write(header_prefix.pack(map_magic, map_format_version, len(header_bytes)))
+        f.write(header_bytes)
+        f.seek(tiles_offset)
+        f.write(np.ascontiguousarray(tile_map.tiles).tobytes())
+        if heights is not None:
+            f.seek(heights_offset)
+            f.write(np.ascontiguousarray(heights, dtype=np.float16).tobytes())
+    print(f"Map saved as {filename}")
+
+
+# Reads the JSON header of a map file. Returns None if the file isn't a map file.
+def read_map_header(filename):
+    with open(filename, 'rb') as f:
+        prefix = f.read(header_prefix.size)
+        if len(prefix) < header_prefix.size:
+            print(f"Error: {filename} is not a map file.")
+            return None
+        magic, version, header_length = header_prefix.unpack(prefix)
+        if magic != map_magic:
+            print(f"Error: {filename} is not a map file.")
+            return None
+        if version != map_format_version:
+            print(f"Error: {filename} uses map format version {version}, expected {map_format_version}.")
+            return None
+        return json.loads(f.read(header_length))
+
+
+# Palette entries are stored as (symbol, ANSI color) pairs. Maps that use the
+# terrain palette get terrain_tiles back, so they share the palette (and its
+# glyph atlas) with freshly generated maps.
+def palette_from_header(palette):
+    if palette == [[tile.raw_symbol, tile.color] for tile in terrain_tiles]:
+        return terrain_tiles
+    tiles = np.empty(len(palette), dtype=object)
+    tiles[:] = [ASCIITile(symbol, color, colored=True) if color else ASCIITile(symbol, colored=False)
+                for symbol, color in palette]
+    return tiles
+
+
+# A saved map, with the tiles and heights memory mapped from the file.
+class MapFile():
+
+    def __init__(self, filename, header):
+        self.filename = filename
+        self.header = header
+        self.width = header["width"]
+        self.height = header["height"]
+        self.seed = header["seed"]
+        self.biome_params = header["biome_params"]
+
+        shape = (self.height, self.width)
+        self.tiles = np.memmap(filename, dtype=np.uint8, mode='r', offset=header["tiles_offset"], shape=shape)
+        self.heights = None
+        if header["heights_offset"] is not None:
+            self.heights = np.memmap(filename, dtype=np.float16, mode='r', offset=header["heights_offset"], shape=shape)
+        self.tile_map = TileMap(self.tiles, self.heights, palette_from_header(header["palette"]))
+
+
+# Opens a map saved with save_map. Returns a MapFile, or None if filename isn't
+# a map file.
+def load_map(filename):
+    try:
+        header = read_map_header(filename)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not read map file {filename}: {e}")
+        return None
+    if header is None:
+        return None
+    return MapFile(filename, header)
@@ -0,0 +1,371 @@
+import json
+import os
+import numpy as np
+import pygame
+from tile_map import as_tile_map
+from world_config import DisplayMode, ascii_color_map
+# TODO: Make a Map Rendering Function file
+# Use this to handle all aspects of the world gen
+# as the complexity of this project grows.
+
+
+# Every glyph is rendered once per font, tile size and palette and kept here,
+# and the last map drawn is kept as a finished surface until its tiles change.
+glyph_atlases = {}
+map_surface_cache = None
+
+
+# All the palette's glyphs rendered side by side on one surface. glyph_areas[code]
+# is the part of the atlas holding the glyph for tile code `code`.
+class GlyphAtlas():
+    def __init__(self, font, symbols, colors):
+        glyphs = [font.render(symbol, True, color) for symbol, color in zip(symbols, colors)]
+        cell_width = max([glyph.get_width() for glyph in glyphs], default=1)
+        cell_height = max([glyph.get_height() for glyph in glyphs], default=1)
+        
+        self.surface = pygame.Surface((cell_width * max(len(glyphs), 1), cell_height), pygame.SRCALPHA)
+        self.glyph_areas = []
+        for i, glyph in enumerate(glyphs):
+            self.surface.blit(glyph, (i * cell_width, 0))
+            self.glyph_areas.append(pygame.Rect(i * cell_width, 0, glyph.get_width(), glyph.get_height()))
+
+
+def get_glyph_atlas(tile_map, font, color_mapping=ascii_color_map):
+    symbols = tuple(tile_map.symbol_table.tolist())
+    colors = tuple(map(tuple, tile_map.palette_colors(color_mapping).tolist()))
+    key = (font, symbols, colors)
+    if key not in glyph_atlases:
+        glyph_atlases[key] = GlyphAtlas(font, symbols, colors)
+    return glyph_atlases[key]
+
+
+# Composes the whole map onto one surface. PIXEL_MODE builds the surface from
+# the tile codes and the palette colors, ASCII_MODE blits every glyph from the
+# atlas in one Surface.blits call. Returns None for an unknown display mode.
+def render_map_surface(tile_map, tile_size, font, display_mode, color_mapping=ascii_color_map):
+    size = (tile_map.width * tile_size, tile_map.height * tile_size)
+    
+    if display_mode == DisplayMode.ASCII_MODE:
+        surface = pygame.Surface(size)
+        atlas = get_glyph_atlas(tile_map, font, color_mapping)
+        areas = atlas.glyph_areas
+        codes = tile_map.tiles.tolist()
+        surface.blits([(atlas.surface, (x * tile_size, y * tile_size), areas[code])
+                       for y, row in enumerate(codes) for x, code in enumerate(row)], doreturn=False)
+    elif display_mode == DisplayMode.PIXEL_MODE:
+        # Render tiles as solid colored pixels: the tile codes become an 8 bit
+        # surface with the palette colors as its palette, one pixel per tile, and
+        # that is scaled up to the tile size (nearest neighbour, so no blending)
+        surface = pygame.image.frombytes(np.ascontiguousarray(tile_map.tiles).tobytes(), (tile_map.width, tile_map.height), "P")
+        surface.set_palette([tuple(color) for color in tile_map.palette_colors(color_mapping).tolist()])
+        if tile_size != 1:
+            surface = pygame.transform.scale(surface, size)
+    else:
+        return None
+    return surface
+
+
+# Returns the composed surface for the map, reusing the last one when the map,
+# tile size, font and display mode haven't changed since the last call.
+def get_map_surface(tile_map, tile_size, font, display_mode):
+    global map_surface_cache
+    settings = (tile_size, font, display_mode)
+    if map_surface_cache is not None:
+        cached_map, cached_tiles, cached_settings, surface = map_surface_cache
+        if cached_map is tile_map and cached_settings == settings and np.array_equal(cached_tiles, tile_map.tiles):
+            return surface
+    
+    surface = render_map_surface(tile_map, tile_size, font, display_mode)
+    if surface is not None:
+        map_surface_cache = (tile_map, tile_map.tiles.copy(), settings, surface)
+    return surface
+
+
+# world_map can be a TileMap or the old list of lists of ASCIITiles. Pass the
+# same TileMap every frame so the composed map surface gets reused, the old 
+# lists have to be converted again on every call.
+def draw_tilemap(window, world_map, tile_size, font, display_mode, generate_image=False, filename=None):
+    tile_map = as_tile_map(world_map)
+    surface = get_map_surface(tile_map, tile_size, font, display_mode)
+    if surface is None:
+        print(f"Error: Invalid map render mode provided. Receieved display_mode = {display_mode}")
+        return
+    
+    window.blit(surface, (0, 0))
+    if generate_image:
+        pygame.image.save(surface, filename)
+
+# Post this (pygame.event.post(pygame.event.Event(MAP_CHANGED, world_map=new_map)))
+# to get a running viewer to redraw, world_map is optional if the map was edited in place.
+MAP_CHANGED = pygame.event.custom_type()
+
+# Events that mean the window contents have to be drawn again.
+redraw_events = (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESIZED,
+                 pygame.WINDOWSIZECHANGED, pygame.WINDOWRESTORED, MAP_CHANGED)
+
+
+# Looking a font up by name (SysFont, match_font) scans every font installed on
+# the system, which takes longer than generating a small world. The path it
+# finds is saved in font_cache_file and reused by every run after the first.
+# None means the font isn't installed and pygame's default font is used.
+tile_font_name = 'Consolas'
+font_cache_file = os.path.join(os.path.expanduser("~"), ".cache", "proc_painter", "fonts.json")
+font_paths = {}
+
+def get_font_path(name=tile_font_name):
+    if name in font_paths:
+        return font_paths[name]
+
+    try:
+        with open(font_cache_file, 'r') as f:
+            cached_paths = json.load(f)
+    except (OSError, ValueError):
+        cached_paths = {}
+    path = cached_paths.get(name, "")
+    if path == "" or (path is not None and not os.path.exists(path)):
+        pygame.font.init()
+        path = pygame.font.match_font(name)
+        cached_paths[name] = path
+        try:
+            os.makedirs(os.path.dirname(font_cache_file), exist_ok=True)
+            with open(font_cache_file, 'w') as f:
+                json.dump(cached_paths, f)
+        except OSError:
+            pass # no cache this time, the font still loads
+    font_paths[name] = path
+    return path
+
+
+# Same font SysFont would give, without the font scan.
+def load_font(font_size, name=tile_font_name):
+    pygame.font.init()
+    return pygame.font.Font(get_font_path(name), font_size)
+
+
+# Fonts sized for a tile size, so glyphs keep filling their tiles at any zoom.
+tile_fonts = {}
+
+def get_tile_font(font_size):
+    if font_size not in tile_fonts:
+        tile_fonts[font_size] = load_font(font_size)
+    return tile_fonts[font_size]
+
+
+# Zoom levels as (pixels per tile, tiles per pixel). Past 1 pixel per tile the
+# viewport only shows every step-th tile of the map, like the LOD levels.
+zoom_levels = [(1, 16), (1, 8), (1, 4), (1, 2), (1, 1), (2, 1), (3, 1), (4, 1), (6, 1), (8, 1),
+               (12, 1), (16, 1), (24, 1), (32, 1), (48, 1)]
+
+
+# A pannable, zoomable view onto a map that only renders the tiles inside the
+# window, so a frame costs about the same for a 17x17 map as for a 4k x 4k one.
+#   - Arrow keys / WASD pan, +/- or the mouse wheel zoom, Home fits the whole map
+#   - Dragging with the mouse pans
+# ASCII_MODE maps switch to solid pixels once tiles are smaller than min_glyph_size.
+class MapViewport():
+
+    def __init__(self, world_map, tile_size, font, display_mode, font_scale=1.25, min_glyph_size=8):
+        self.set_map(world_map)
+        self.base_tile_size = tile_size
+        self.base_font = font
+        self.display_mode = display_mode
+        self.font_scale = font_scale
+        self.min_glyph_size = min_glyph_size
+        self.zoom = zoom_levels.index(min(zoom_levels, key=lambda level: abs(level[0] / level[1] - tile_size)))
+        self.x, self.y = 0.0, 0.0 # map tile at the top left corner of the window
+        self.window_size = (0, 0)
+        self.dragging = False
+
+    # level_step > 1 shows a coarse level of detail (see WorldGenerator.create_world_levels)
+    # where each tile stands for level_step x level_step tiles of the finished map.
+    def set_map(self, world_map, level_step=1):
+        self.tile_map = as_tile_map(world_map)
+        self.level_step = level_step
+        self.map_width = self.tile_map.width * level_step
+        self.map_height = self.tile_map.height * level_step
+        self.invalidate()
+
+    # Drops the composed surface, call it after editing the map in place
+    # (run_map_viewer does on MAP_CHANGED).
+    def invalidate(self):
+        self.surface_cache = None
+
+    # Pixels per map tile at the current zoom.
+    def scale(self):
+        tile_size, step = zoom_levels[self.zoom]
+        return tile_size / step
+
+    # Zooms out until the whole map fits in the window (or as far as it goes).
+    def fit(self, window_size):
+        self.window_size = window_size
+        self.zoom = 0
+        for i, (tile_size, step) in enumerate(zoom_levels):
+            if self.map_width * tile_size / step <= window_size[0] and self.map_height * tile_size / step <= window_size[1]:
+                self.zoom = i
+        self.x, self.y = 0.0, 0.0
+
+    # Same as fit, but only if the map doesn't already fit at the current zoom.
+    def fit_if_needed(self, window_size):
+        self.window_size = window_size
+        if self.map_width * self.scale() > window_size[0] or self.map_height * self.scale() > window_size[1]:
+            self.fit(window_size)
+
+    def pan(self, dx_pixels, dy_pixels):
+        self.x += dx_pixels / self.scale()
+        self.y += dy_pixels / self.scale()
+        self.clamp()
+
+    # Zooms in (levels > 0) or out (levels < 0), keeping the map tile under the
+    # pixel `anchor` in place. anchor defaults to the middle of the window.
+    def zoom_by(self, levels, anchor=None):
+        if anchor is None:
+            anchor = (self.window_size[0] / 2, self.window_size[1] / 2)
+        anchor_x, anchor_y = self.x + anchor[0] / self.scale(), self.y + anchor[1] / self.scale()
+        self.zoom = min(max(self.zoom + levels, 0), len(zoom_levels) - 1)
+        self.x, self.y = anchor_x - anchor[0] / self.scale(), anchor_y - anchor[1] / self.scale()
+        self.clamp()
+
+    # Keeps the view on the map, or at its top left when the map is smaller than the window.
+    def clamp(self):
+        self.x = min(max(self.x, 0.0), max(self.map_width - self.window_size[0] / self.scale(), 0.0))
+        self.y = min(max(self.y, 0.0), max(self.map_height - self.window_size[1] / self.scale(), 0.0))
+
+    # Returns True if the event moved the view and the window needs a redraw.
+    def handle_event(self, e):
+        pan_keys = {pygame.K_LEFT: (-1, 0), pygame.K_a: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_d: (1, 0),
+                    pygame.K_UP: (0, -1), pygame.K_w: (0, -1), pygame.K_DOWN: (0, 1), pygame.K_s: (0, 1)}
+        if e.type == pygame.KEYDOWN:
+            if e.key in pan_keys:
+                dx, dy = pan_keys[e.key]
+                self.pan(dx * self.window_size[0] / 8, dy * self.window_size[1] / 8)
+            elif e.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom_by(1)
+            elif e.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom_by(-1)
+            elif e.key == pygame.K_HOME:
+                self.fit(self.window_size)
+            else:
+                return False
+            return True
+        if e.type == pygame.MOUSEWHEEL:
+            self.zoom_by(e.y, pygame.mouse.get_pos())
+            return True
+        if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
+            self.dragging = True
+        elif e.type == pygame.MOUSEBUTTONUP and e.button == 1:
+            self.dragging = False
+        elif e.type == pygame.MOUSEMOTION and self.dragging:
+            self.pan(-e.rel[0], -e.rel[1])
+            return True
+        return False
+
+    # Draws the part of the map inside the window.
+    def draw(self, window):
+        self.window_size = window.get_size()
+        self.clamp()
+        if self.level_step > 1:
+            self.draw_coarse(window)
+            return
+        tile_size, step = zoom_levels[self.zoom]
+
+        # First visible tile (lined up with the step so zoomed out views don't
+        # shimmer while panning) and how many tiles it takes to cover the window
+        left, top = int(self.x) // step * step, int(self.y) // step * step
+        columns = -(-self.window_size[0] // tile_size) + 1
+        rows = -(-self.window_size[1] // tile_size) + 1
+        right, bottom = left + columns * step, top + rows * step
+
+        # The composed surface covers the window plus half a window on every
+        # side, so redraws while panning around only blit it again. It's only
+        # composed again once the view leaves it or the zoom changes.
+        cache = self.surface_cache
+        if cache is None or cache[0] != self.zoom or not (cache[1] <= left and cache[2] <= top and
+                                                          right <= cache[3] and bottom <= cache[4]):
+            cache_left = max(left - columns // 2 * step, 0)
+            cache_top = max(top - rows // 2 * step, 0)
+            cache_right, cache_bottom = right + columns // 2 * step, bottom + rows // 2 * step
+            visible = self.tile_map.region(cache_left, cache_top, cache_right - cache_left, cache_bottom - cache_top, step)
+            if visible.width == 0 or visible.height == 0:
+                return
+            cache = (self.zoom, cache_left, cache_top, cache_right, cache_bottom, self.compose(visible, tile_size))
+            self.surface_cache = cache
+        window.blit(cache[5], (round((cache[1] - self.x) * self.scale()), round((cache[2] - self.y) * self.scale())))
+
+    def compose(self, visible, tile_size):
+        if self.display_mode == DisplayMode.ASCII_MODE and tile_size >= self.min_glyph_size:
+            if tile_size == self.base_tile_size and self.base_font is not None:
+                font = self.base_font
+            else:
+                font = get_tile_font(round(tile_size * self.font_scale))
+            return render_map_surface(visible, tile_size, font, DisplayMode.ASCII_MODE)
+        return render_map_surface(visible, tile_size, None, DisplayMode.PIXEL_MODE)
+
+    # Coarse levels are only shown for a moment, so they're drawn as pixels and
+    # stretched to the size the finished map will have.
+    def draw_coarse(self, window):
+        level_step, scale = self.level_step, self.scale()
+        left, top = int(self.x / level_step), int(self.y / level_step)
+        columns = int(self.window_size[0] / (scale * level_step)) + 2
+        rows = int(self.window_size[1] / (scale * level_step)) + 2
+        visible = self.tile_map.region(left, top, columns, rows)
+        if visible.width == 0 or visible.height == 0:
+            return
+        
+        surface = render_map_surface(visible, 1, None, DisplayMode.PIXEL_MODE)
+        size = (max(round(visible.width * level_step * scale), 1), max(round(visible.height * level_step * scale), 1))
+        window.blit(pygame.transform.scale(surface, size),
+                    (round((left * level_step - self.x) * scale), round((top * level_step - self.y) * scale)))
+
+
+# Shows world_map until the window is closed. The loop sleeps until an event
+# comes in and only draws again on resize, expose, pan/zoom or MAP_CHANGED, so
+# an idle viewer uses next to no CPU. max_fps caps how often it can redraw
+# while events are streaming in (e.g. dragging the map around).
+# Pass viewport to carry on from a MapViewport that was already on screen.
+def run_map_viewer(window, world_map, tile_size, font, display_mode, max_fps=60, background_color=(0, 0, 0), viewport=None):
+    if viewport is None:
+        viewport = MapViewport(world_map, tile_size, font, display_mode)
+        viewport.fit_if_needed(window.get_size())
+    viewport.set_map(world_map)
+    clock = pygame.time.Clock()
+    needs_redraw = True
+    running = True
+    while running:
+        if needs_redraw:
+            # Remember: Not using fill will cause the game to write 
+            # frames on top of old ones.
+            window.fill(background_color)
+            viewport.draw(window)
+            pygame.display.flip()
+            needs_redraw = False
+            clock.tick(max_fps)
+        
+        for e in [pygame.event.wait()] + pygame.event.get():
+            if e.type == pygame.QUIT:
+                running = False
+            elif e.type in redraw_events:
+                needs_redraw = True
+                if e.type == MAP_CHANGED:
+                    if hasattr(e, "world_map"):
+                        viewport.set_map(e.world_map)
+                    else:
+                        viewport.invalidate()
+            elif viewport.handle_event(e):
+                needs_redraw = True
+
+
+# Saves the map as an image in one go, see render_map_surface. ASCII_MODE uses
+# font if given, otherwise a Consolas font sized to the tiles.
+def save_tilemap_to_png(tilemap, tile_size, color_mapping, display_mode, filename="tilemap.png", font=None):
+    
+    tile_map = as_tile_map(tilemap)
+    if display_mode == DisplayMode.ASCII_MODE and font is None:
+        font = get_tile_font(tile_size)
+    
+    image_surface = render_map_surface(tile_map, tile_size, font, display_mode, color_mapping)
+    if image_surface is None:
+        print(f"Error: Invalid map render mode provided. Receieved display_mode = {display_mode}")
+        return
+
+    pygame.image.save(image_surface, filename)
+    print(f"Tilemap saved as {filename}")
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# On-disk cache for the LLM prompt extraction. The same prompt sent with the
+# same system message to the same model is answered from here instead of
+# another round trip to the API. Entries are small JSON files named after a
+# hash of those inputs, so a hit is one file read.
+#
+# Entries older than ttl_seconds are treated as misses (and deleted), and once
+# there are more than max_bytes of them the least recently used ones go.
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "proc_painter", "prompts")
+default_max_bytes = 16 * 1024 * 1024
+default_ttl_seconds = 7 * 24 * 60 * 60
+
+
+# Prompts that only differ in case or whitespace get the same entry.
+def normalize_prompt(prompt):
+    return " ".join(prompt.split()).casefold()
+
+
+class PromptCache():
+
+    # clock returns the current time in seconds, it's only swapped out in tests.
+    # Entry files get their last use time from it as their mtime.
+    def __init__(self, cache_dir=default_cache_dir, max_bytes=default_max_bytes, ttl_seconds=default_ttl_seconds,
+                 clock=time.time):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # Hash of everything that goes into the request.
+    def make_key(self, prompt, system_message, model):
+        inputs = {"prompt": normalize_prompt(prompt),
+                  "system_message": system_message,
+                  "model": model}
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    # Returns the cached world data, or None on a miss.
+    def get(self, key):
+        entry_file = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(entry_file, 'r') as f:
+                entry = json.load(f)
+            now = self.clock()
+            if now - entry["created"] > self.ttl_seconds:
+                os.remove(entry_file)
+                return None
+            os.utime(entry_file, (now, now)) # mark as recently used
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry["world_data"]
+
+    def put(self, key, world_data):
+        now = self.clock()
+        entry = {"created": now, "world_data": world_data}
+
+        # Write to a temp file first so other runs never read half an entry.
+        fd, temp_file = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.utime(temp_file, (now, now))
+            os.replace(temp_file, os.path.join(self.cache_dir, f"{key}.json"))
+        except (OSError, TypeError, ValueError):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    # Deletes expired entries, then the least recently used ones until the
+    # cache fits in max_bytes.
+    def evict(self):
+        entries = []
+        total_bytes = 0
+        now = self.clock()
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith(".tmp-") or not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > self.ttl_seconds:
+                    os.remove(entry.path) # expired, and unused since
+                    continue
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_bytes += stat.st_size
+
+        for _, entry_bytes, entry_file in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_file)
+            except OSError:
+                pass
+            total_bytes -= entry_bytes
+
+    def clear(self):
+        for entry in os.scandir(self.cache_dir):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# Looks prompt up in prompt_cache and only calls extract(prompt) on a miss.
+# Answers with an "error" key aren't cached. prompt_cache can be None, then
+# extract is always called.
+def cached_extract(prompt_cache, prompt, system_message, model, extract):
+    if prompt_cache is None:
+        return extract(prompt)
+
+    key = prompt_cache.make_key(prompt, system_message, model)
+    world_data = prompt_cache.get(key)
+    if world_data is not None:
+        return world_data
+
+    world_data = extract(prompt)
+    if isinstance(world_data, dict) and "error" not in world_data:
+        prompt_cache.put(key, world_data)
+    return world_data
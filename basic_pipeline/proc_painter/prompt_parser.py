@@ -0,0 +1,191 @@
+import re
+
+# Offline stand-in for the LLM prompt extraction. Matches direction words
+# (north, top left, center...) and biome words (ocean, desert, woods...) in
+# each clause of the prompt and builds the same JSON the LLM is asked for:
+#
+#   {"biomes": {region: biome}, "temperature": {region: ...},
+#    "precipitation": {region: ...}, "seed": ..., "map_size": ...}
+#
+# It only understands prompts of the "<biome> in the <region>" kind, so
+# parse_world_prompt also returns a confidence between 0 and 1. Prompts it
+# couldn't place every biome of (or with negations, islands, rivers and the
+# like) get a low one, and main.py sends those to the LLM instead.
+
+regions = ["north", "south", "east", "west", "northeast", "southeast", "northwest", "southwest", "center"]
+
+# The order biomes are written out in. create_biome_mask paints the regions one
+# after another, later ones covering earlier ones, and west alone is two thirds
+# of the map wide, so the sides go first and the corners and center last.
+paint_order = ["east", "west", "north", "south", "northeast", "northwest", "southeast", "southwest", "center"]
+
+default_temperature = "temperate"
+default_precipitation = "medium"
+
+# Below this the prompt should go to the LLM.
+min_confidence = 0.8
+
+region_words = {
+    "north": "north", "northern": "north", "top": "north", "upper": "north",
+    "south": "south", "southern": "south", "bottom": "south", "lower": "south",
+    "east": "east", "eastern": "east", "right": "east",
+    "west": "west", "western": "west", "left": "west",
+    "northeast": "northeast", "northeastern": "northeast",
+    "northwest": "northwest", "northwestern": "northwest",
+    "southeast": "southeast", "southeastern": "southeast",
+    "southwest": "southwest", "southwestern": "southwest",
+    "center": "center", "centre": "center", "central": "center", "middle": "center",
+}
+
+# Two word directions ("north east", "top-left", "upper right"...) are joined
+# into one word before the prompt is split up.
+compound_regions = re.compile(r"\b(north|south|top|upper|bottom|lower)[\s-]*(east|west|right|left)(ern)?\b")
+compound_names = {"top": "north", "upper": "north", "bottom": "south", "lower": "south", "right": "east", "left": "west"}
+
+biome_words = {
+    "water": "water", "ocean": "water", "oceans": "water", "sea": "water", "seas": "water", "lake": "water",
+    "lakes": "water",
+    "desert": "desert", "deserts": "desert", "dunes": "desert", "sand": "desert", "sandy": "desert",
+    "plains": "plains", "plain": "plains", "grassland": "plains", "grasslands": "plains", "grassy": "plains",
+    "field": "plains", "fields": "plains", "meadow": "plains", "meadows": "plains", "prairie": "plains",
+    "forest": "forest", "forests": "forest", "woods": "forest", "woodland": "forest", "woodlands": "forest",
+    "trees": "forest", "jungle": "forest", "wooded": "forest", "forested": "forest",
+    "tundra": "tundra", "snow": "tundra", "snowy": "tundra", "ice": "tundra", "icy": "tundra",
+    "frozen": "tundra", "arctic": "tundra", "glacier": "tundra", "glaciers": "tundra",
+    "mountains": "mountains", "mountain": "mountains", "mountainous": "mountains", "peaks": "mountains",
+    "rocky": "mountains", "cliffs": "mountains", "hills": "mountains", "hilly": "mountains",
+}
+
+temperature_words = {
+    "hot": "hot", "warm": "warm", "scorching": "hot", "tropical": "hot",
+    "cold": "cold", "cool": "cool", "chilly": "cold", "freezing": "freezing", "frigid": "freezing",
+    "temperate": "temperate", "mild": "temperate",
+}
+
+precipitation_words = {
+    "rainy": "high", "wet": "high", "humid": "high", "stormy": "high", "rain": "high",
+    "dry": "low", "arid": "low", "parched": "low",
+}
+
+# Words that cover the whole map, "a forest everywhere".
+everywhere_words = {"everywhere", "entire", "whole", "all", "covered"}
+
+# Things this parser has no way of placing (negations, shapes, features
+# between regions). Any of them knocks the confidence down.
+hard_words = {"no", "not", "without", "except", "but", "island", "islands", "river", "rivers", "between",
+              "surrounded", "surrounding", "border", "borders", "coast", "coastal", "near", "around", "beside"}
+
+clause_split = re.compile(r"[,.;:!?]|\band\b|\bwith\b|\bwhile\b|\bwhereas\b|\bthen\b")
+word_pattern = re.compile(r"[a-z]+")
+seed_pattern = re.compile(r"\bseed\b\s*(?:of|is|=|:)?\s*([a-z0-9]+)")
+map_size_pattern = re.compile(r"\b(extra[\s-]*small|extra[\s-]*large|tiny|small|medium|large|big|huge)\s+(?:map|world)\b")
+map_size_names = {"tiny": "extra small", "big": "large", "huge": "extra large"}
+
+
+def join_compound_region(match):
+    vertical = compound_names.get(match.group(1), match.group(1))
+    horizontal = compound_names.get(match.group(2), match.group(2))
+    return vertical + horizontal
+
+
+# Returns (world_data, confidence). The biomes only have the regions the prompt
+# placed (plus the corners they carry over to), the mask is plains everywhere
+# else. A background biome goes under every other region first. Temperature and
+# precipitation have every region, filled with the defaults.
+def parse_world_prompt(prompt):
+    text = prompt.lower()
+    world_data = {}
+
+    # Seeds and map sizes first, so their words don't get read as anything else
+    seed = seed_pattern.search(text)
+    if seed:
+        world_data["seed"] = seed.group(1)
+        text = text[:seed.start()] + text[seed.end():]
+    map_size = map_size_pattern.search(text)
+    if map_size:
+        size = re.sub(r"[\s-]+", " ", map_size.group(1))
+        world_data["map_size"] = map_size_names.get(size, size)
+        text = text[:map_size.start()] + text[map_size.end():]
+
+    text = compound_regions.sub(join_compound_region, text)
+
+    biomes = {}
+    temperature = {}
+    precipitation = {}
+    background = []      # biomes with no region, they fill whatever is left
+    pending_regions = [] # regions mentioned before their biome, "north and south are mountains"
+    last_biome = None
+    placed = 0
+    unplaced = 0
+    hard = False
+
+    for clause in clause_split.split(text):
+        words = word_pattern.findall(clause)
+        clause_regions = [region_words[word] for word in words if word in region_words]
+        clause_biomes = [biome_words[word] for word in words if word in biome_words]
+        hard = hard or any(word in hard_words for word in words)
+        everywhere = any(word in everywhere_words for word in words)
+
+        # Temperature and precipitation words go to the clause's regions, or
+        # the whole map when it has none
+        for word in words:
+            for table, values in ((temperature_words, temperature), (precipitation_words, precipitation)):
+                if word in table:
+                    for region in (clause_regions or regions):
+                        values[region] = table[word]
+
+        if clause_biomes and (clause_regions or pending_regions):
+            clause_regions = pending_regions + clause_regions
+            pending_regions = []
+            if len(set(clause_biomes)) == 1:
+                for region in clause_regions:
+                    biomes[region] = clause_biomes[0]
+                placed += 1
+            elif len(clause_biomes) == len(clause_regions):
+                # "desert north, forest south" written without a separator
+                biomes.update(zip(clause_regions, clause_biomes))
+                placed += len(clause_biomes)
+            else:
+                unplaced += len(clause_biomes)
+            last_biome = clause_biomes[-1]
+        elif clause_biomes:
+            if everywhere:
+                background[:0] = clause_biomes[:1]
+            else:
+                background.extend(clause_biomes)
+            last_biome = clause_biomes[-1]
+        elif clause_regions:
+            # "mountains in the north and south", the south clause has no biome of its own
+            if last_biome is not None and not pending_regions:
+                for region in clause_regions:
+                    biomes[region] = last_biome
+            else:
+                pending_regions.extend(clause_regions)
+
+    # One biome without a region is the backdrop ("a forest with a lake in the
+    # center"), more than one and there's no telling which goes where.
+    if background:
+        placed += 1
+        unplaced += len(set(background) - {background[0]})
+    unplaced += len(pending_regions)
+
+    # Corners take on the north or south biome when they weren't mentioned.
+    for side, corners in (("north", ("northeast", "northwest")), ("south", ("southeast", "southwest"))):
+        if side in biomes:
+            for corner in corners:
+                biomes.setdefault(corner, biomes[side])
+
+    world_data["biomes"] = {}
+    if background:
+        world_data["biomes"].update((region, background[0]) for region in paint_order if region not in biomes)
+    world_data["biomes"].update((region, biomes[region]) for region in paint_order if region in biomes)
+    world_data["temperature"] = {region: temperature.get(region, default_temperature) for region in regions}
+    world_data["precipitation"] = {region: precipitation.get(region, default_precipitation) for region in regions}
+
+    if placed == 0:
+        return world_data, 0.0
+    confidence = placed / (placed + unplaced)
+    if hard:
+        confidence *= 0.5
+    return world_data, confidence
+
@@ -9,6 +9,10 @@ if [ ! -f prompts.txt ]; then
     exit 1
 fi
 
+# Extract the world data for every prompt up front, concurrently. The answers
+# land in the prompt cache, so the main.py runs below don't wait on the API.
+python3 ../batch_extract.py prompts.txt --out world_data.jsonl
+
 # Create a master results file
 results_file="results.txt"
 echo "Starting evaluation..." > "$results_file"
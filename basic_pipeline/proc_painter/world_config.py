@@ -17,6 +17,16 @@ class MapSizes(Enum):
     LARGE_MAP = 65 # n = 6
     EXTRA_LARGE_MAP = 129 # n = 7
 
+# Maps can be sized with a MapSizes member, a side length for a square map or
+# a (width, height) tuple. Returns (width, height).
+def map_dimensions(map_size):
+    if isinstance(map_size, MapSizes):
+        map_size = map_size.value
+    if isinstance(map_size, (tuple, list)):
+        width, height = map_size
+        return int(width), int(height)
+    return int(map_size), int(map_size)
+
 class Biome(Enum):
     WATER = 0
     DESERT = 1
@@ -25,6 +35,10 @@ class Biome(Enum):
     TUNDRA = 4
     MOUNTAINS = 5
     
+# Height cut-offs between the terrain tiles (see terrain_tiles in ascii_tile.py),
+# tile i covers heights from terrain_thresholds[i - 1] up to terrain_thresholds[i].
+terrain_thresholds = [0.2, 0.4, 0.7, 1.2, 1.9]
+
 # ASCII terrain mapping
 TERRAIN_CHARS = {
     "water": "~",
@@ -1,51 +1,75 @@
 # Midpoint Displacement + Cellular Automata
 import numpy as np
-from ascii_tile import water_tile, mountain_tile, plains_tile, desert_tile, forest_tile, pines_tile, lava_tile, snow_tile
+from ascii_tile import water_tile, mountain_tile, plains_tile, desert_tile, forest_tile, pines_tile, lava_tile, snow_tile, terrain_tiles, classify_heights
 from biome_mask import create_biome_mask, print_mask
-from diamond_square import generate_heightmap_w_biome_mask, smooth_biome_transitions
+from diamond_square import generate_heightmap_w_biome_mask, generate_heightmap_levels, smooth_biome_transitions
+from terminal_renderer import print_tilemap
+from tile_map import TileMap
 from utility_methods import print_grid
-from world_config import DisplayMode, MapSizes
+from world_config import DisplayMode, MapSizes, map_dimensions, terrain_thresholds
 
 class WorldGenerator():
     
-    def __init__(self, map_size, user_params, roughness=0.5, display_mode=DisplayMode.ASCII_MODE, seed=None):
-        self.map_size = map_size.value
+    # map_size can be a MapSizes member, a side length or a (width, height) tuple.
+    # Seeded worlds are loaded from / saved to heightmap_cache when one is given.
+    # terrain_thresholds sets the height cut-offs between the terrain tiles.
+    # With tty_only=True the finished map is only printed when stdout is a terminal.
+    def __init__(self, map_size, user_params, roughness=0.5, display_mode=DisplayMode.ASCII_MODE, seed=None, heightmap_cache=None,
+                 terrain_thresholds=terrain_thresholds, tty_only=False):
+        self.width, self.height = map_dimensions(map_size)
+        self.map_size = (self.width, self.height)
         self.base_roughness = roughness
         self.user_params = user_params
         self.display_mode = display_mode
         self.seed = seed
+        self.heightmap_cache = heightmap_cache
+        # One threshold between each pair of tiles, any more and the tile codes
+        # would run off the end of terrain_tiles
+        if len(terrain_thresholds) != len(terrain_tiles) - 1:
+            raise ValueError(f"terrain_thresholds needs {len(terrain_tiles) - 1} values, one between each pair of "
+                             f"the {len(terrain_tiles)} terrain tiles, got {len(terrain_thresholds)}")
+        self.terrain_thresholds = terrain_thresholds
+        self.tty_only = tty_only
         
         print(f"Creating a new world")
-        print(f"Map dimensions: {self.map_size}x{self.map_size}")
+        print(f"Map dimensions: {self.width}x{self.height}")
         print(f"Inspired by the following user_params: {self.user_params}")
         print(f"Generator Seed: {self.seed}")
  
+    # Classifies heightmap values into a uint8 grid of terrain tile indexes, look
+    # them up in terrain_tiles, terrain_symbols or terrain_colors from ascii_tile.py.
+    def heightmap_to_tiles(self, grid):
+        return classify_heights(grid, self.terrain_thresholds)
+
     # TODO: Move this to a map renderer class.
     def heightmap_to_ascii(self, grid):
-        """Converts heightmap values into ASCII terrain tiles."""
-        ascii_map = []
-        for row in grid:
-            line = []
-            for val in row:
-                if val < 0.2:
-                    line.append(water_tile)
-                elif val < 0.4:
-                    line.append(desert_tile)
-                elif val < 0.7:
-                    line.append(plains_tile)
-                elif val < 1.2:
-                    line.append(pines_tile)
-                elif val < 1.9:
-                    line.append(mountain_tile)
-                else:
-                    line.append(snow_tile)
-            ascii_map.append(line)
-        return ascii_map
+        """Converts heightmap values into a TileMap of ASCII terrain tiles."""
+        return TileMap(self.heightmap_to_tiles(grid), grid, terrain_tiles)
 
-    # TODO: Adjust these default vals & get a better understanding of what they do
-    def create_world(self, roughness=0.5):
-        # Generate ASCII World
-        
+    # Seeded worlds always come out the same, so when there's a heightmap cache
+    # the biome mask and heightmaps are loaded from it instead of regenerated.
+    def load_or_generate_heightmaps(self, roughness):
+        cache_key = self.heightmap_cache_key(roughness)
+        if cache_key is None:
+            return self.generate_heightmaps(roughness)
+
+        cached = self.heightmap_cache.get(cache_key)
+        if cached is not None:
+            print("Loaded biome mask and heightmaps from the cache")
+            return cached
+
+        heightmaps = self.generate_heightmaps(roughness)
+        if heightmaps[0] is not None:
+            self.heightmap_cache.put(cache_key, *heightmaps)
+        return heightmaps
+
+    def heightmap_cache_key(self, roughness):
+        if self.heightmap_cache is None or not self.seed:
+            return None
+        return self.heightmap_cache.make_key(self.map_size, self.user_params, roughness, self.seed)
+
+    # Returns the biome mask, raw heightmap and smoothed heightmap.
+    def generate_heightmaps(self, roughness):
         # PRE-PROCESSING (Pre-Heightmap)
         # ===============================
         
@@ -76,6 +100,52 @@ class WorldGenerator():
         smoothed_hm = smooth_biome_transitions(biome_mask, height_map)
         # print_grid(smoothed_hm)
         
+        return biome_mask, height_map, smoothed_hm
+
+    # Progressive version of create_world for big maps. Yields (step, ascii_world)
+    # for every level of detail as soon as it's ready, coarsest first. Each tile 
+    # of a level covers step x step tiles of the finished map, and the last 
+    # level (step = 1) is the finished world that create_world would return, and
+    # is printed the same way. Given heightmaps (see create_world), that finished
+    # world is the only level.
+    def create_world_levels(self, roughness=0.5, heightmaps=None):
+        if heightmaps is not None:
+            yield 1, self.finished_world(heightmaps[2])
+            return
+
+        cache_key = self.heightmap_cache_key(roughness)
+        cached = None if cache_key is None else self.heightmap_cache.get(cache_key)
+        if cached is not None:
+            print("Loaded biome mask and heightmaps from the cache")
+            yield 1, self.finished_world(cached[2])
+            return
+
+        biome_mask = create_biome_mask(self.map_size, self.user_params)
+        for step, height_map in generate_heightmap_levels(self.map_size, biome_mask, roughness, seed=self.seed):
+            if step > 1:
+                # Rough preview, smoothed against the biomes under the coarse points
+                yield step, self.heightmap_to_ascii(smooth_biome_transitions(biome_mask[::step, ::step], height_map))
+
+        smoothed_hm = smooth_biome_transitions(biome_mask, height_map)
+        if cache_key is not None:
+            self.heightmap_cache.put(cache_key, biome_mask, height_map, smoothed_hm)
+        yield 1, self.finished_world(smoothed_hm)
+
+    def finished_world(self, smoothed_hm):
+        ascii_world = self.heightmap_to_ascii(smoothed_hm)
+        print_tilemap(ascii_world, only_tty=self.tty_only)
+        return ascii_world
+
+    # TODO: Adjust these default vals & get a better understanding of what they do
+    # heightmaps can be the (biome_mask, height_map, smoothed_hm) of this world if
+    # they were already generated (see early_heightmaps.py).
+    def create_world(self, roughness=0.5, heightmaps=None):
+        # Generate ASCII World
+        
+        if heightmaps is None:
+            heightmaps = self.load_or_generate_heightmaps(roughness)
+        biome_mask, height_map, smoothed_hm = heightmaps
+        
         # POST-PROCESSING
         # ======================
         # TODO: Add post processing rules, I'll do this after the pipeline has been prototyped
@@ -92,10 +162,7 @@ class WorldGenerator():
         # TODO: Add map frame
 
         # Print ASCII world
-        # for row in ascii_world:
-        #     for tile in row:
-        #         print(tile.symbol, end="")
-        #     print()
+        # print_tilemap(ascii_world, only_tty=self.tty_only)
 
         return ascii_world
 
@@ -1,3 +1,6 @@
+import numpy as np
+from world_config import Biome, ascii_color_map, terrain_thresholds
+
 # ANSI COLOR CODES FOR DISPLAY (may move these to a Colors class later on for modularity)
 ANSI_RESET = "\033[0m"
 ANSI_YELLOW = "\033[33m"
@@ -13,7 +16,9 @@ class ASCIITile:
     def __init__(self, symbol: str, color: str = ANSI_RESET, colored: bool = True):
         self.raw_symbol = symbol
         self.symbol = None
+        self.color = None
         if colored:
+            self.color = color
             self.symbol = f"{color}{symbol}{ANSI_RESET}"
 
 # TODO: Store the tiles below in a dict that can be imported.      
@@ -30,5 +35,30 @@ lava_tile = ASCIITile("l", ANSI_RED)
 water_tile = ASCIITile("~", ANSI_CYAN)
 
 # note, it would be nice to have flowers be a set of random colors. 
-flower_tile = ASCIITile("*", ANSI_MAGENTA) 
-        
\ No newline at end of file
+flower_tile = ASCIITile("*", ANSI_MAGENTA)
+
+# Biome lookup table, index it with Biome.value codes (e.g. a biome mask).
+biome_tiles = np.empty(len(Biome), dtype=object)
+biome_tiles[Biome.WATER.value] = water_tile
+biome_tiles[Biome.DESERT.value] = desert_tile
+biome_tiles[Biome.PLAINS.value] = plains_tile
+biome_tiles[Biome.FOREST.value] = forest_tile
+biome_tiles[Biome.TUNDRA.value] = snow_tile
+biome_tiles[Biome.MOUNTAINS.value] = mountain_tile
+
+# Terrain palette. Tile indexes from WorldGenerator.heightmap_to_tiles look up
+# the tile, its symbol and its RGB color in these tables.
+terrain_tiles = np.array([water_tile, desert_tile, plains_tile, pines_tile, mountain_tile, snow_tile], dtype=object)
+terrain_symbols = np.array([tile.raw_symbol for tile in terrain_tiles])
+terrain_colors = np.array([ascii_color_map.get(tile.raw_symbol, (255, 255, 255)) for tile in terrain_tiles], dtype=np.uint8)
+
+
+# Classifies heights into a uint8 grid of terrain tile indexes, same as an
+# if/elif ladder over the (sorted) thresholds. Counting the thresholds each
+# height isn't below is a handful of array compares, a lot quicker than 
+# np.digitize, and NaNs end up on the last tile just like the ladder.
+def classify_heights(heights, thresholds=terrain_thresholds):
+    tiles = np.zeros(np.shape(heights), dtype=np.uint8)
+    for threshold in thresholds:
+        tiles += ~(heights < threshold)
+    return tiles
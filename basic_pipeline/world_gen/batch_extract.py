@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from main import model_name, system_message
+from openai_client import get_async_client
+from prompt_cache import PromptCache
+
+# Extracts world data for a whole list of prompts at once, for evaluation runs.
+# Requests go out concurrently (at most max_concurrency in flight), a token
+# bucket keeps them under requests_per_second, and transient errors (rate
+# limits, timeouts, 5xx) are retried with exponential backoff.
+#
+# Answers go into the same prompt cache main.py reads, so sweeping the prompts
+# here first means the main.py runs that follow don't wait on the API at all.
+#
+#   python batch_extract.py prompts.txt --out world_data.jsonl
+#   python batch_extract.py prompts.txt --base-url http://127.0.0.1:8000/v1  # see chat_stand_in.py
+
+default_max_concurrency = 8
+default_requests_per_second = 5.0
+default_max_retries = 4
+default_base_delay = 0.5
+
+# HTTP statuses worth another try, everything else fails straight away.
+retry_statuses = {408, 409, 429, 500, 502, 503, 504}
+
+
+# Lets requests through at rate per second on average, with bursts of up to
+# capacity requests after a quiet spell.
+class TokenBucket():
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def is_transient(error):
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in retry_statuses
+
+
+# One prompt, with retries. Returns the parsed JSON or {"error": ...} like
+# main.extract_world_data.
+async def request_world_data_async(client, prompt, limiter, semaphore, max_retries=default_max_retries,
+                                   base_delay=default_base_delay):
+    for attempt in range(max_retries + 1):
+        try:
+            async with semaphore:
+                await limiter.acquire()
+                response = await client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": prompt}
+                    ],
+                )
+            return json.loads(response.choices[0].message.content.strip())
+        except Exception as e:
+            if attempt == max_retries or not is_transient(e):
+                return {"error": str(e)}
+            # Full jitter, so requests that failed together don't all come back together
+            await asyncio.sleep(random.uniform(0, base_delay * 2 ** attempt))
+
+
+# Returns the world data for every prompt, in the same order. Cached prompts
+# don't go out at all, new answers are added to prompt_cache.
+async def extract_world_data_batch_async(prompts, max_concurrency=default_max_concurrency,
+                                         requests_per_second=default_requests_per_second,
+                                         max_retries=default_max_retries, base_delay=default_base_delay,
+                                         base_url=None, prompt_cache=None, client=None):
+    results = [None] * len(prompts)
+    missing = {} # prompt -> indexes, duplicates are only asked once
+    for i, prompt in enumerate(prompts):
+        cached = None
+        if prompt_cache is not None:
+            cached = prompt_cache.get(prompt_cache.make_key(prompt, system_message, model_name))
+        if cached is not None:
+            results[i] = cached
+        else:
+            missing.setdefault(prompt, []).append(i)
+    if not missing:
+        return results
+
+    if client is None:
+        # Retries are done here instead, under the rate limit
+        client = get_async_client(base_url, max_retries=0)
+
+    limiter = TokenBucket(requests_per_second)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    answers = await asyncio.gather(*(request_world_data_async(client, prompt, limiter, semaphore, max_retries, base_delay)
+                                     for prompt in missing))
+
+    for (prompt, indexes), world_data in zip(missing.items(), answers):
+        if prompt_cache is not None and isinstance(world_data, dict) and "error" not in world_data:
+            prompt_cache.put(prompt_cache.make_key(prompt, system_message, model_name), world_data)
+        for i in indexes:
+            results[i] = world_data
+    return results
+
+
+def extract_world_data_batch(prompts, **kwargs):
+    return asyncio.run(extract_world_data_batch_async(prompts, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract world data for every prompt in a file, concurrently.")
+    parser.add_argument("prompts", type=str, help="Text file with one prompt per line.")
+    parser.add_argument("--out", "-o", type=str, default="world_data.jsonl", help="JSON lines file to write the results to.")
+    parser.add_argument("--concurrency", type=int, default=default_max_concurrency, help="Requests in flight at once.")
+    parser.add_argument("--rps", type=float, default=default_requests_per_second, help="Requests per second at most.")
+    parser.add_argument("--retries", type=int, default=default_max_retries, help="Retries per prompt on transient errors.")
+    parser.add_argument("--base-url", type=str, help="Chat completions API to use instead of OpenAI's, e.g. a local stand-in.")
+    parser.add_argument("--no-prompt-cache", action='store_true', help="Ask for every prompt, even ones already answered.")
+    args = parser.parse_args()
+
+    with open(args.prompts, 'r') as f:
+        prompts = [line.strip() for line in f if line.strip()]
+
+    prompt_cache = None if args.no_prompt_cache else PromptCache()
+    start = time.perf_counter()
+    results = extract_world_data_batch(prompts, max_concurrency=args.concurrency, requests_per_second=args.rps,
+                                       max_retries=args.retries, base_url=args.base_url, prompt_cache=prompt_cache)
+    elapsed = time.perf_counter() - start
+
+    with open(args.out, 'w') as f:
+        for prompt, world_data in zip(prompts, results):
+            f.write(json.dumps({"prompt": prompt, "world_data": world_data}) + "\n")
+    errors = sum(1 for world_data in results if "error" in world_data)
+    print(f"Extracted {len(prompts)} prompts in {elapsed:.2f} s ({errors} errors), saved to {args.out}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
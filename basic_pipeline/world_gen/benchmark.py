@@ -0,0 +1,196 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import numpy as np
+
+# Render stages need a display surface, the dummy driver lets them run headless.
+os.environ.setdefault('SDL_VIDEODRIVER', "dummy")
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+import pygame
+
+from biome_mask import create_biome_mask
+from diamond_square import generate_heightmap_w_biome_mask, smooth_biome_transitions
+import png_writer
+from map_renderer import draw_tilemap, render_map_surface, save_tilemap_to_png
+from world_config import DisplayMode, MapSizes, ascii_color_map
+from world_generator import WorldGenerator
+
+# Benchmarks every stage of the world_gen pipeline at every MapSizes value plus
+# a few bigger synthetic sizes, then compares the timings against the baseline
+# committed next to this file.
+#
+#   python benchmark.py                    # run and compare against the baseline
+#   python benchmark.py --update-baseline  # run and save the results as the new baseline
+#
+# Exits with 1 if any stage got slower (or hungrier) than the thresholds allow.
+
+baseline_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+bench_seed = 1234
+bench_params = {'north': 'water',
+                'south': 'mountains',
+                'center': 'forest',
+                'east': 'desert',
+                'northwest': 'tundra'}
+synthetic_sizes = [257, 513, 1025]
+
+# Small tiles keep the 1025 map's image at 4100x4100 pixels.
+render_tile_size = 4
+
+# Writing the PNG goes through zlib and the disk, which swings a lot more than
+# the in-memory stages, so it gets more slack than --time-threshold.
+stage_time_slack = {"save_tilemap_to_png": 1.5, "save_tilemap_to_png_headless": 1.5}
+
+stage_names = ["create_biome_mask", "generate_heightmap_w_biome_mask", "smooth_biome_transitions",
+               "heightmap_to_ascii", "render_map_surface", "draw_tilemap", "save_tilemap_to_png",
+               "save_tilemap_to_png_headless"]
+
+
+# Builds the inputs for every stage at the given size up front, so each stage is
+# timed on its own. Returns {stage name: function to time}.
+def make_stages(size, font, temp_dir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        world = WorldGenerator(size, bench_params, seed=bench_seed)
+        biome_mask = create_biome_mask(size, bench_params)
+        height_map = generate_heightmap_w_biome_mask(size, biome_mask, seed=bench_seed)
+        smoothed_hm = smooth_biome_transitions(biome_mask, height_map)
+        world_map = world.heightmap_to_ascii(smoothed_hm)
+
+    window = pygame.Surface((size * render_tile_size, size * render_tile_size))
+    png_file = os.path.join(temp_dir, "benchmark.png")
+    return {
+        "create_biome_mask": lambda: create_biome_mask(size, bench_params),
+        "generate_heightmap_w_biome_mask": lambda: generate_heightmap_w_biome_mask(size, biome_mask, seed=bench_seed),
+        "smooth_biome_transitions": lambda: smooth_biome_transitions(biome_mask, height_map),
+        "heightmap_to_ascii": lambda: world.heightmap_to_ascii(smoothed_hm),
+        # render_map_surface is the first frame of a new map, draw_tilemap every frame after it
+        "render_map_surface": lambda: render_map_surface(world_map, render_tile_size, font, DisplayMode.PIXEL_MODE),
+        "draw_tilemap": lambda: draw_tilemap(window, world_map, render_tile_size, font, DisplayMode.PIXEL_MODE),
+        "save_tilemap_to_png": lambda: save_tilemap_to_png(world_map, render_tile_size, ascii_color_map,
+                                                           DisplayMode.PIXEL_MODE, filename=png_file),
+        "save_tilemap_to_png_headless": lambda: png_writer.save_tilemap_to_png(world_map, render_tile_size, ascii_color_map,
+                                                                               DisplayMode.PIXEL_MODE, filename=png_file),
+    }
+
+
+# Best time out of repeat runs, then one more run under tracemalloc for the
+# peak memory (tracemalloc slows things down, so it isn't timed). tracemalloc
+# only sees Python allocations, pygame surfaces don't show up in it.
+def measure(stage, repeat):
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        stage()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"seconds": round(min(times), 6), "peak_bytes": peak_bytes}
+
+
+def run_benchmarks(sizes, stages_to_run, repeat):
+    pygame.font.init()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") # no fc-list on headless boxes, the default font is fine
+        font = pygame.font.SysFont('Consolas', 30)
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in sizes:
+            for name, stage in make_stages(size, font, temp_dir).items():
+                if name not in stages_to_run:
+                    continue
+                results[f"{name}@{size}"] = measure(stage, repeat)
+                print_result(f"{name}@{size}", results[f"{name}@{size}"])
+    return results
+
+
+def print_result(key, result, note=""):
+    print(f"{key:<40} {result['seconds'] * 1000:>10.2f} ms {result['peak_bytes'] / 1024**2:>10.2f} MiB  {note}")
+
+
+# Returns a list of messages, one per stage that regressed.
+# Timings under min_seconds are too noisy to judge, so they're only checked
+# once they are also min_seconds slower than the baseline.
+def compare_to_baseline(results, baseline, time_threshold, memory_threshold, min_seconds=0.005):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        stage_threshold = time_threshold * stage_time_slack.get(key.split("@")[0], 1.0)
+        if result["seconds"] > base["seconds"] * stage_threshold and result["seconds"] - base["seconds"] > min_seconds:
+            regressions.append(f"{key}: {base['seconds'] * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms")
+        if result["peak_bytes"] > base["peak_bytes"] * memory_threshold and result["peak_bytes"] - base["peak_bytes"] > 1024**2:
+            regressions.append(f"{key}: {base['peak_bytes'] / 1024**2:.2f} MiB -> {result['peak_bytes'] / 1024**2:.2f} MiB")
+    return regressions
+
+
+def load_baseline(filename):
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        print(f"No baseline found at {filename}, run with --update-baseline to create one.")
+        return None
+
+
+# Stages and sizes that weren't run keep their old baseline entries.
+def save_baseline(filename, results):
+    old_results = {}
+    if os.path.exists(filename):
+        old_results = load_baseline(filename)
+    baseline = {"machine": f"{platform.machine()} {platform.system()} Python {platform.python_version()} numpy {np.__version__}",
+                "results": {**old_results, **results}}
+    with open(filename, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Saved baseline to {filename}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the world_gen pipeline stages against a saved baseline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[size.value for size in MapSizes] + synthetic_sizes,
+                        help="Map sizes to benchmark (default: every MapSizes value plus 257, 513 and 1025).")
+    parser.add_argument("--stages", nargs="+", choices=stage_names, default=stage_names, help="Stages to benchmark.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage, the best one is kept.")
+    parser.add_argument("--baseline", default=baseline_file, help="Baseline JSON file to compare against.")
+    parser.add_argument("--update-baseline", action='store_true', help="Save these results as the new baseline.")
+    parser.add_argument("--time-threshold", type=float, default=1.5,
+                        help="Flag a stage when it takes more than this many times its baseline time.")
+    parser.add_argument("--memory-threshold", type=float, default=1.25,
+                        help="Flag a stage when its peak memory is more than this many times the baseline.")
+    args = parser.parse_args()
+
+    print(f"{'stage@size':<40} {'time':>13} {'peak memory':>14}")
+    results = run_benchmarks(args.sizes, args.stages, args.repeat)
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        return 0
+    regressions = compare_to_baseline(results, baseline, args.time_threshold, args.memory_threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print("  " + regression)
+        return 1
+    print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
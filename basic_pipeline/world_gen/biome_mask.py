@@ -1,5 +1,6 @@
 import numpy as np
-from world_config import MapSizes, Biome, biome_dict
+from ascii_tile import biome_tiles
+from world_config import MapSizes, Biome, biome_dict, map_dimensions
 from utility_methods import print_grid
     
 # ! Do I even need this class?
@@ -9,20 +10,28 @@ class BiomeMask():
     def __init__(self, size):
         self.width = size
         self.height = size
-        self.mask = []
-        
-        for _ in range(0, size):
-            self.mask.append([Biome.WATER for _ in range(0, size)])
+        self.mask = np.full((size, size), Biome.WATER.value, dtype=np.uint8)
             
+# Prints the mask using each biome's tile symbol.
 def print_mask(mask):
-    for row in mask:
-        print("".join(str(cell.value) for cell in row))
+    for row in biome_tiles[mask]:
+        print("".join(tile.raw_symbol for tile in row))
         # print("".join(str(cell) for cell in row))
             
-def create_biome_mask(size, user_params):
+# The mask holds Biome.value codes as uint8 so later stages can index the 
+# biome lookup tables with it directly. size is a side length or a 
+# (width, height) tuple, the mask has shape (height, width).
+# window = (x, y, width, height) builds just that part of the mask instead, 
+# cells that fall off the map are plains.
+def create_biome_mask(size, user_params, window=None):
+    width, height = map_dimensions(size)
+    if window is None:
+        window = (0, 0, width, height)
+    left, top, window_width, window_height = window
+    
     # Plains is the default biome
     # mask = np.full((size, size), 'plains', dtype=object)
-    mask = np.full((size, size), biome_dict['plains'], dtype=object)
+    mask = np.full((window_height, window_width), biome_dict['plains'].value, dtype=np.uint8)
     
     print(f"Creating a biome mask with the following items: ", user_params.items())
     
@@ -31,29 +40,34 @@ def create_biome_mask(size, user_params):
         # print(f"Creating biome mask for {{ {region}, {biome} }}...")
         
         if region == 'north':
-            mask[:size//3, :] = biome_dict[biome]
+            rows, cols = slice(None, height//3), slice(None)
         elif region == 'south':
-            mask[-size//3:, :] = biome_dict[biome]
+            rows, cols = slice(-height//3, None), slice(None)
         elif region == 'east':
-            mask[:, -size//3:] = biome_dict[biome]
+            rows, cols = slice(None), slice(-width//3, None)
         elif region == 'west':
-            mask[:, :-size//3] = biome_dict[biome]
+            rows, cols = slice(None), slice(None, -width//3)
         elif region == 'northeast':
-            mask[:size//3, -size//3:] = biome_dict[biome]
+            rows, cols = slice(None, height//3), slice(-width//3, None)
         elif region == 'northwest':
-            mask[:size//3, :size//3] = biome_dict[biome]
+            rows, cols = slice(None, height//3), slice(None, width//3)
         elif region == 'southeast':
-            mask[-size//3:, -size//3:] = biome_dict[biome]
+            rows, cols = slice(-height//3, None), slice(-width//3, None)
         elif region == 'southwest':
-            mask[-size//3:, :size//3] = biome_dict[biome]
+            rows, cols = slice(-height//3, None), slice(None, width//3)
         elif region == 'center':
-            center = size // 2
-            radius = size // 6
-            mask[center-radius-1:center+radius+1, center-radius-1:center+radius+1] = biome_dict[biome]
+            center_y, center_x = height // 2, width // 2
+            radius_y, radius_x = height // 6, width // 6
+            rows, cols = slice(center_y-radius_y-1, center_y+radius_y+1), slice(center_x-radius_x-1, center_x+radius_x+1)
         else:
             print("Invalid region provided: ", region)
             return None
         
+        # Resolve the region on the full map, then shift it into the window
+        first_row, last_row, _ = rows.indices(height)
+        first_col, last_col, _ = cols.indices(width)
+        mask[max(first_row - top, 0):max(last_row - top, 0), max(first_col - left, 0):max(last_col - left, 0)] = biome_dict[biome].value
+        
     return mask 
 
         
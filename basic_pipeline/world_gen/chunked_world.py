@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import numpy as np
+from biome_mask import create_biome_mask
+from diamond_square import generate_heightmap_w_biome_mask, smooth_biome_transitions, biome_param_grids, displacement
+from world_config import DisplayMode, MapSizes
+from terminal_renderer import print_tilemap
+from tile_map import TileMap
+from world_generator import WorldGenerator
+
+# Streams a world in fixed-size square chunks instead of generating the whole
+# map at once. Every chunk only depends on the world seed and its chunk
+# coordinate, so any chunk can be (re)built on demand in any order.
+#
+# Chunk borders are pinned before the heightmap is generated: corners and
+# edges get their own seeds from their world coordinates, so the two chunks on
+# either side of an edge build exactly the same heights for it. Smoothing reads
+# a one cell ring of the neighbouring chunks' raw heights, so it matches
+# what smoothing the whole map at once would give.
+#
+# map_size sets where the user_params regions go (north, center...). Chunks off
+# the map still generate, they're just plains.
+class ChunkedWorldGenerator(WorldGenerator):
+
+    def __init__(self, map_size, user_params, chunk_size=64, cache_size=64, roughness=0.5, display_mode=DisplayMode.ASCII_MODE, seed=None):
+        super().__init__(map_size, user_params, roughness, display_mode, seed)
+        if chunk_size < 2 or chunk_size & (chunk_size - 1):
+            raise ValueError(f"chunk_size must be a power of 2, got {chunk_size}")
+
+        # Chunks have to agree with each other, so pick a seed now if we weren't given one.
+        if self.seed is None:
+            self.seed = int(np.random.SeedSequence().entropy % 2**63)
+            print(f"Chunk seed: {self.seed}")
+
+        self.chunk_size = chunk_size
+        self.smoothing_radius = 1
+        self.chunks = ChunkCache(cache_size)      # finished chunks
+        self.raw_chunks = ChunkCache(cache_size)  # (biome mask, heightmap) before smoothing
+
+    # Returns the tiles for the given rectangle of the world as a TileMap, only
+    # generating the chunks that overlap it.
+    def get_region(self, x, y, width, height):
+        tiles = np.zeros((height, width), dtype=np.uint8)
+        heights = np.zeros((height, width))
+        size = self.chunk_size
+        for chunk_y in range(y // size, (y + height - 1) // size + 1):
+            for chunk_x in range(x // size, (x + width - 1) // size + 1):
+                chunk = self.get_chunk(chunk_x, chunk_y)
+
+                # Overlap of the chunk and the region, in chunk coordinates
+                top, bottom = max(y - chunk_y * size, 0), min(y + height - chunk_y * size, size)
+                left, right = max(x - chunk_x * size, 0), min(x + width - chunk_x * size, size)
+                region_rows = slice(chunk_y * size + top - y, chunk_y * size + bottom - y)
+                region_cols = slice(chunk_x * size + left - x, chunk_x * size + right - x)
+                tiles[region_rows, region_cols] = chunk.tiles.tiles[top:bottom, left:right]
+                heights[region_rows, region_cols] = chunk.height_map[top:bottom, left:right]
+        return TileMap(tiles, heights)
+
+    def get_chunk(self, chunk_x, chunk_y):
+        return self.chunks.get_or_create((chunk_x, chunk_y), self.create_chunk)
+
+    def create_chunk(self, key):
+        chunk_x, chunk_y = key
+        size, radius = self.chunk_size, self.smoothing_radius
+
+        # Stitch the raw heights of this chunk and its 8 neighbours together,
+        # then cut out this chunk plus the ring smoothing needs around it.
+        biome_mask = np.zeros((3 * size, 3 * size), dtype=np.uint8)
+        height_map = np.zeros((3 * size, 3 * size))
+        for dy in range(3):
+            for dx in range(3):
+                mask, heights = self.raw_chunks.get_or_create((chunk_x + dx - 1, chunk_y + dy - 1), self.create_raw_chunk)
+                biome_mask[dy * size:(dy + 1) * size, dx * size:(dx + 1) * size] = mask[:size, :size]
+                height_map[dy * size:(dy + 1) * size, dx * size:(dx + 1) * size] = heights[:size, :size]
+        ring = slice(size - radius, 2 * size + radius)
+        smoothed_hm = smooth_biome_transitions(biome_mask[ring, ring], height_map[ring, ring], self.smoothing_radius)
+        smoothed_hm = smoothed_hm[radius:-radius, radius:-radius]
+
+        return WorldChunk(chunk_x, chunk_y, biome_mask[size:2 * size, size:2 * size], smoothed_hm, self.heightmap_to_ascii(smoothed_hm))
+
+    # Generates the (chunk_size + 1)^2 heightmap tile for a chunk. The last row
+    # and column are the first row and column of the next chunks over.
+    def create_raw_chunk(self, key):
+        chunk_x, chunk_y = key
+        size = self.chunk_size
+        x, y = chunk_x * size, chunk_y * size
+        biome_mask = create_biome_mask(self.map_size, self.user_params, window=(x, y, size + 1, size + 1))
+
+        border = np.full((size + 1, size + 1), np.nan)
+        border[0, :] = self.edge_heights(x, y, horizontal=True)
+        border[size, :] = self.edge_heights(x, y + size, horizontal=True)
+        border[:, 0] = self.edge_heights(x, y, horizontal=False)
+        border[:, size] = self.edge_heights(x + size, y, horizontal=False)
+
+        # A 0 seed would be treated as "no seed", hence the `or 1`
+        chunk_seed = int(self.seed_sequence(0, x, y).generate_state(1, np.uint64)[0]) or 1
+        height_map = generate_heightmap_w_biome_mask((size + 1, size + 1), biome_mask, self.base_roughness,
+                                                     seed=chunk_seed, fixed_heights=border)
+        return biome_mask, height_map
+
+    # Heights along the chunk edge that starts at world cell (x, y). These are
+    # filled in level by level with the same recurrence the square step runs
+    # along the top row of a map: each new point takes a third of the one
+    # before it plus the usual noise and biome offset.
+    def edge_heights(self, x, y, horizontal):
+        size = self.chunk_size
+        if horizontal:
+            window = (x, y, size + 1, 1)
+        else:
+            window = (x, y, 1, size + 1)
+        biome_mask = create_biome_mask(self.map_size, self.user_params, window=window).ravel()
+        roughness, height_offset = biome_param_grids(biome_mask, self.base_roughness, 0.1)
+        rng = np.random.default_rng(self.seed_sequence(1 if horizontal else 2, x, y))
+
+        heights = np.zeros(size + 1)
+        heights[0] = self.corner_height(x, y)
+        heights[size] = self.corner_height(x + size, y) if horizontal else self.corner_height(x, y + size)
+        step = size
+        while step > 1:
+            half = step // 2
+            points = np.arange(half, size, step)
+            noise = displacement(rng, roughness[points]) + height_offset[points]
+            previous = 0.0
+            for point, value in zip(points, noise):
+                heights[point] = previous / 3.0 + value
+                previous = heights[point]
+            step = half
+        return heights
+
+    def corner_height(self, x, y):
+        return np.random.default_rng(self.seed_sequence(3, x, y)).uniform(0, 1)
+
+    # Seeds for chunks, edges and corners. SeedSequence needs non-negative
+    # numbers, so world coordinates are zigzag encoded (0, -1, 1, -2... -> 0, 1, 2, 3...).
+    def seed_sequence(self, kind, x, y):
+        zigzag = lambda n: 2 * n if n >= 0 else -2 * n - 1
+        return np.random.SeedSequence([self.seed, kind, zigzag(x), zigzag(y)])
+
+
+class WorldChunk():
+    def __init__(self, chunk_x, chunk_y, biome_mask, height_map, tiles):
+        self.chunk_x = chunk_x
+        self.chunk_y = chunk_y
+        self.biome_mask = biome_mask
+        self.height_map = height_map
+        self.tiles = tiles
+
+
+# Bounded least-recently-used cache. Once it holds max_size entries, adding
+# one more drops the entry that was used longest ago.
+class ChunkCache(OrderedDict):
+
+    def __init__(self, max_size):
+        super().__init__()
+        self.max_size = max_size
+
+    def get_or_create(self, key, create):
+        if key in self:
+            self.move_to_end(key)
+            return self[key]
+        value = create(key)
+        self[key] = value
+        if len(self) > self.max_size:
+            self.popitem(last=False)
+        return value
+
+
+if __name__ == "__main__":
+    user_params = {'north': 'water',
+                'south': 'mountains',
+                'center': 'water'}
+    world = ChunkedWorldGenerator(MapSizes.EXTRA_LARGE_MAP, user_params, chunk_size=32, seed=42)
+    region = world.get_region(48, 48, 40, 20)
+    print_tilemap(region)
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+from world_generator import WorldGenerator
+
+# Starts on a world's heightmaps while the LLM is still answering. Pass
+# on_field to main.extract_world_data: once the streamed answer has a complete
+# 'biomes' object, the biome mask and heightmaps are generated on a worker
+# thread while temperature, precipitation, seed and map_size keep streaming in.
+#
+# The seed usually comes after the biomes, so the heightmaps are generated with
+# whatever seed has arrived by then (usually none, most prompts don't set one).
+# result() only hands them over when the finished answer has the same biomes
+# and seed, otherwise the world is generated again as usual.
+
+
+# The integer seed main.py would use, or None.
+def parse_seed(value):
+    try:
+        return int(value) or None
+    except (TypeError, ValueError):
+        return None
+
+
+class EarlyHeightmaps():
+
+    def __init__(self, map_size, roughness, heightmap_cache=None):
+        self.map_size = map_size
+        self.roughness = roughness
+        self.heightmap_cache = heightmap_cache
+        self.fields = {}
+        self.biomes = None
+        self.seed = None
+        self.future = None
+
+    def on_field(self, key, value):
+        self.fields[key] = value
+        if key != "biomes" or not isinstance(value, dict) or self.future is not None:
+            return
+
+        self.biomes = value
+        self.seed = parse_seed(self.fields.get("seed"))
+        generator = WorldGenerator(self.map_size, value, seed=self.seed, heightmap_cache=self.heightmap_cache)
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.future = executor.submit(generator.load_or_generate_heightmaps, self.roughness)
+        executor.shutdown(wait=False)
+
+    # (biome_mask, height_map, smoothed_hm) if they were generated for these
+    # biomes and seed, otherwise None.
+    def result(self, biomes, seed):
+        if self.future is None or biomes != self.biomes or seed != self.seed:
+            return None
+        try:
+            heightmaps = self.future.result()
+        except Exception as e:
+            print(f"Early heightmap generation failed: {e}")
+            return None
+        if heightmaps[0] is None:
+            return None
+        return heightmaps
@@ -1,31 +1,32 @@
-import openai
 import argparse
 import json
-from dotenv import load_dotenv
-import os
-
-# Load API key from environment variables
-load_dotenv(dotenv_path="../api/.env")
-api_key = os.getenv("OPENAI_API_KEY")
-
-def extract_world_data(prompt):
-    # Define the system instruction explicitly asking for JSON output
-    system_message = (
-        "You are an AI assistant that extracts world generation parameters from natural language prompts and returns them as a JSON object.\n"
-        "Ensure the response is a valid JSON object with the following fields:\n"
-        "- 'biomes': a dictionary mapping 'north', 'south', 'east', 'west', 'northeast', 'southeast', 'northwest', 'southwest' and 'center' to biomes ('water', 'desert', 'plains', 'forest', 'mountains').\n"
-        "- 'temperature': a dictionary mapping regions to temperature descriptions.\n"
-        "- 'precipitation': a dictionary mapping regions to precipitation descriptions.\n"
-        "- 'seed': an optional alphanumeric string if the user specifies one.\n"
-        "- 'map_size': one of ['extra small', 'small', 'medium', 'large', 'extra large'] if specified.\n"
-        "Do not include any text outside of the JSON object."
-    )
-
+from openai_client import get_client
+from prompt_cache import PromptCache, cached_extract
+
+model_name = "gpt-3.5-turbo"
+
+# Define the system instruction explicitly asking for JSON output
+system_message = (
+    "You are an AI assistant that extracts world generation parameters from natural language prompts and returns them as a JSON object.\n"
+    "Ensure the response is a valid JSON object with the following fields:\n"
+    "- 'biomes': a dictionary mapping 'north', 'south', 'east', 'west', 'northeast', 'southeast', 'northwest', 'southwest' and 'center' to biomes ('water', 'desert', 'plains', 'forest', 'mountains').\n"
+    "- 'temperature': a dictionary mapping regions to temperature descriptions.\n"
+    "- 'precipitation': a dictionary mapping regions to precipitation descriptions.\n"
+    "- 'seed': an optional alphanumeric string if the user specifies one.\n"
+    "- 'map_size': one of ['extra small', 'small', 'medium', 'large', 'extra large'] if specified.\n"
+    "Do not include any text outside of the JSON object."
+)
+
+# Repeat prompts are answered from prompt_cache (a PromptCache) when one is given.
+def extract_world_data(prompt, prompt_cache=None):
+    return cached_extract(prompt_cache, prompt, system_message, model_name, request_world_data)
+
+def request_world_data(prompt):
     try:
-        client = openai.OpenAI(api_key=api_key)  # Instantiate OpenAI client
+        client = get_client()  # Shared OpenAI client, its connections are reused between prompts
 
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=model_name,
             messages=[
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt}
@@ -42,10 +43,12 @@ def extract_world_data(prompt):
 def main():
     parser = argparse.ArgumentParser(description="Extract world parameters from a prompt.")
     parser.add_argument("input_text", type=str, help="User description of the world")
+    parser.add_argument("--no-prompt-cache", action='store_true', help="Always ask the LLM instead of reusing the answer to a prompt it has already seen.")
     args = parser.parse_args()
     print(args)
 
-    world_data = extract_world_data(args.input_text)
+    prompt_cache = None if args.no_prompt_cache else PromptCache()
+    world_data = extract_world_data(args.input_text, prompt_cache=prompt_cache)
     print("\nExtracted JSON:\n", json.dumps(world_data, indent=4))
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# On-disk cache for the expensive part of world generation. The same map size,
+# user params, roughness and seed always give the same biome mask and
+# heightmaps, so they're saved as .npy files under a hash of those inputs and
+# loaded back (memory mapped) the next time the same world is asked for.
+#
+# Bump cache_version whenever biome_mask.py or diamond_square.py change what
+# they generate. Entries are stored under a folder per version, and folders from
+# other versions are deleted when the cache is opened.
+cache_version = 2
+
+# world_gen and proc_painter each have their own copy of the generator (and of
+# cache_version), so each gets its own folder. Sharing one would have each
+# package delete the other's entries as outdated.
+package_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "proc_painter", "heightmaps", package_name)
+default_max_bytes = 256 * 1024 * 1024
+
+cache_arrays = ("biome_mask", "height_map", "smoothed_hm")
+
+
+class HeightmapCache():
+
+    # Once the entries take up more than max_bytes, the least recently used
+    # ones are deleted until they fit again.
+    def __init__(self, cache_dir=default_cache_dir, max_bytes=default_max_bytes):
+        self.cache_dir = os.path.join(cache_dir, f"v{cache_version}")
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        for entry in os.listdir(cache_dir):
+            if entry.startswith("v") and entry[1:].isdigit() and entry != f"v{cache_version}":
+                print(f"Removing outdated heightmap cache: {entry}")
+                shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+    # Hash of everything that goes into generating a world. user_params keeps
+    # its order, create_biome_mask paints the regions one after another and
+    # later ones cover earlier ones, so the same pairs in another order can
+    # make a different world.
+    def make_key(self, map_size, user_params, roughness, seed):
+        inputs = {"version": cache_version,
+                  "map_size": list(map_size),
+                  "user_params": list(user_params.items()),
+                  "roughness": roughness,
+                  "seed": seed}
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+    # Returns (biome_mask, height_map, smoothed_hm) as read-only memmaps, or None on a miss.
+    def get(self, key):
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            arrays = tuple(np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r') for name in cache_arrays)
+            os.utime(entry_dir) # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def put(self, key, biome_mask, height_map, smoothed_hm):
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry_dir):
+            return
+
+        # Write everything to a temp folder first so other runs never see half an entry.
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            for name, array in zip(cache_arrays, (biome_mask, height_map, smoothed_hm)):
+                np.save(os.path.join(temp_dir, f"{name}.npy"), array)
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Most likely another run stored the same world first.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    # Deletes the least recently used entries until the cache fits in max_bytes.
+    def evict(self):
+        entries = []
+        total_bytes = 0
+        for key in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, key)
+            if key.startswith(".tmp-") or not os.path.isdir(entry_dir):
+                continue
+            try:
+                entry_bytes = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                entries.append((os.stat(entry_dir).st_mtime, entry_bytes, entry_dir))
+            except OSError:
+                continue
+            total_bytes += entry_bytes
+
+        for _, entry_bytes, entry_dir in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= entry_bytes
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
@@ -1,22 +1,29 @@
 import argparse
 import json
-import logging
-import openai
 import os
-import pygame
 import sys
 
-from dotenv import load_dotenv
-from map_renderer import draw_tilemap, save_tilemap_to_png
 from world_config import MapSizes, ascii_color_map
+from early_heightmaps import EarlyHeightmaps
+from heightmap_cache import HeightmapCache
+from json_stream import JSONFieldStream
+from map_file import save_map
+from openai_client import get_client
+from prompt_cache import PromptCache, cached_extract
+from prompt_parser import min_confidence, parse_world_prompt
+import png_writer
 from world_generator import WorldGenerator
 from world_config import DisplayMode
 
 # Surpress pygame welcome messages
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 
-load_dotenv(dotenv_path="../api/.env")
-api_key = os.getenv("OPENAI_API_KEY")
+# pygame, openai and dotenv take longer to import than a small world takes to
+# generate, so they're only imported on the code paths that use them: the
+# viewer, the pygame PNG writer and the LLM call (see openai_client). A
+# --quiet --parser local run never imports any of them, not even when it saves
+# a PNG with --png-writer headless. map_renderer imports pygame, so it's
+# imported late too.
 
 def load_json_config(json_file):
     '''_summary_
@@ -36,7 +43,26 @@ def load_json_config(json_file):
         print(f"Error loading JSON: {e}")
         return None
 
-def extract_world_data(prompt):
+model_name = "gpt-3.5-turbo"
+
+# Define the system instruction explicitly asking for JSON output
+system_message = (
+    "You are an AI assistant that extracts world generation parameters from natural language prompts and returns them as a JSON object.\n"
+    "Ensure the response is a valid JSON object with the following fields:\n"
+    "- 'biomes': a dictionary mapping 'north', 'south', 'east', 'west', 'northeast', 'southeast', 'northwest', 'southwest' and 'center' to biomes ('water', 'desert', 'plains', 'forest', 'mountains').\n"
+    "- 'temperature': a dictionary mapping regions to temperature descriptions.\n"
+    "- 'precipitation': a dictionary mapping regions to precipitation descriptions.\n"
+    "- 'seed': an optional alphanumeric string if the user specifies one.\n"
+    "- 'map_size': one of ['extra small', 'small', 'medium', 'large', 'extra large'] if specified.\n"
+    "The default value for biomes, temperature and preceptiation are 'plains', 'temperate' and 'medium' respectively."
+    "If a feature in the north or south are specified without mention of features in corner regions, then the corner regions should also take on the feature for the north or south."
+    "Do not include any text outside of the JSON object."
+)
+
+# Repeat prompts are answered from prompt_cache (a PromptCache) when one is given.
+# With on_field the answer is streamed, and on_field(key, value) is called for
+# each top level field as soon as it has arrived (see stream_world_data).
+def extract_world_data(prompt, prompt_cache=None, on_field=None):
     '''_summary_
 
     Args:
@@ -45,26 +71,18 @@ def extract_world_data(prompt):
     Returns:
         _type_: _description_
     '''
-    
-    # Define the system instruction explicitly asking for JSON output
-    system_message = (
-        "You are an AI assistant that extracts world generation parameters from natural language prompts and returns them as a JSON object.\n"
-        "Ensure the response is a valid JSON object with the following fields:\n"
-        "- 'biomes': a dictionary mapping 'north', 'south', 'east', 'west', 'northeast', 'southeast', 'northwest', 'southwest' and 'center' to biomes ('water', 'desert', 'plains', 'forest', 'mountains').\n"
-        "- 'temperature': a dictionary mapping regions to temperature descriptions.\n"
-        "- 'precipitation': a dictionary mapping regions to precipitation descriptions.\n"
-        "- 'seed': an optional alphanumeric string if the user specifies one.\n"
-        "- 'map_size': one of ['extra small', 'small', 'medium', 'large', 'extra large'] if specified.\n"
-        "The default value for biomes, temperature and preceptiation are 'plains', 'temperate' and 'medium' respectively."
-        "If a feature in the north or south are specified without mention of features in corner regions, then the corner regions should also take on the feature for the north or south."
-        "Do not include any text outside of the JSON object."
-    )
+    extract = request_world_data
+    if on_field is not None:
+        extract = lambda prompt: stream_world_data(prompt, on_field)
+    return cached_extract(prompt_cache, prompt, system_message, model_name, extract)
 
+# Sends prompt to the model, returns the parsed JSON or {"error": ...}.
+def request_world_data(prompt):
     try:
-        client = openai.OpenAI(api_key=api_key)  # Instantiate OpenAI client
+        client = get_client()  # Shared OpenAI client, its connections are reused between prompts
 
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=model_name,
             messages=[
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt}
@@ -78,6 +96,44 @@ def extract_world_data(prompt):
     except Exception as e:
         return {"error": str(e)}
 
+# Same as request_world_data, but with a streamed completion. The answer is
+# parsed as it comes in and every top level field goes to on_field(key, value)
+# the moment it's complete, so work that only needs the biomes can start while
+# the rest of the answer is still being written.
+def stream_world_data(prompt, on_field):
+    try:
+        client = get_client()
+        stream = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True,
+        )
+
+        fields = JSONFieldStream()
+        for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            for key, value in fields.feed(chunk.choices[0].delta.content):
+                on_field(key, value)
+        return fields.value()
+    except Exception as e:
+        return {"error": str(e)}
+
+# Turns the prompt into world data with the chosen backend: 'llm', 'local' (the
+# offline prompt_parser) or 'auto', which tries the offline parser first and
+# only asks the LLM when the parser isn't confident about its answer.
+def parse_prompt(prompt, backend="llm", prompt_cache=None, min_confidence=min_confidence, on_field=None):
+    if backend != "llm":
+        world_data, confidence = parse_world_prompt(prompt)
+        if backend == "local" or confidence >= min_confidence:
+            print(f"Prompt parsed offline (confidence {confidence:.2f})")
+            return world_data
+        print(f"Offline parser isn't confident enough ({confidence:.2f}), asking the LLM")
+    return extract_world_data(prompt, prompt_cache=prompt_cache, on_field=on_field)
+
 
 def main():
     # Handle command line args.
@@ -86,12 +142,24 @@ def main():
     parser.add_argument("--file", "-f", type=str, help="Path of the text file containing the prompt.")
     parser.add_argument("--debug", '-d', action='store_true', help="Toggles debug mode.")
     parser.add_argument("--quiet", '-q', action='store_true', help="Mutes all non-critical outputs.")
+    parser.add_argument("--tty-only", action='store_true', help="Only print the map to the terminal when stdout is a TTY.")
     parser.add_argument("--seed", '-s', type=int, help="Specifies the world generator seed.")
+    parser.add_argument("--no-cache", action='store_true', help="Always regenerate the heightmap instead of loading seeded worlds from the on-disk cache.")
+    parser.add_argument("--no-prompt-cache", action='store_true', help="Always ask the LLM instead of reusing the answer to a prompt it has already seen.")
+    parser.add_argument("--no-stream", action='store_true', help="Wait for the whole LLM answer before generating, instead of starting as soon as the biomes arrive.")
+    parser.add_argument("--parser", choices=["llm", "local", "auto"], default="llm",
+                    help="Prompt parser: 'llm', 'local' (offline keyword matching, no network) or 'auto' (local, falling back to the LLM when unsure) (default: 'llm').")
+    parser.add_argument("--min-confidence", type=float, default=min_confidence,
+                    help=f"With --parser auto, prompts the local parser is less confident about go to the LLM (default: {min_confidence}).")
+    parser.add_argument("--png-writer", choices=["pygame", "headless"], default="pygame",
+                    help="Image writer: 'pygame' or 'headless' (pure numpy/zlib, no SDL needed) (default: 'pygame').")
     parser.add_argument("-m", "--mode", choices=["ascii", "pixel", "a", "p"], default="ascii", 
                     help="Choose display mode: 'ascii' or 'pixel' (default: 'ascii').") 
+    parser.add_argument("--map-file", "-b", type=str, metavar="FILE",
+                    help="Saves the map in the compact binary .ppmap format (tile codes, heights, seed and biome params).")
+    parser.add_argument("--image", "--img", "-i", type=str, metavar="FILE",
+                    help="Saves the map as a PNG image at this path. If omitted, no image is saved.")
     # Not yet functional below this line.
-    parser.add_argument("--img", "-i", type=str, metavar="DIR", 
-                    help="Specify a directory where the image should be saved. If omitted, no image is saved.")
     parser.add_argument("--verbose", '-v', action='store_true', help="Toggles verbose output mode.")
     args = parser.parse_args()
 
@@ -111,7 +179,13 @@ def main():
     print("\033[38;2;64;244;208m=================================\033[0m")
     
     print("Processing user prompt: ", user_prompt)
-    world_data = extract_world_data(user_prompt)
+    prompt_cache = None if args.no_prompt_cache else PromptCache()
+    heightmap_cache = None if args.no_cache else HeightmapCache()
+    map_size = MapSizes.SMALL_MAP
+    # Streamed LLM answers start the heightmaps as soon as their biomes are in
+    early_heightmaps = None if args.no_stream else EarlyHeightmaps(map_size, roughness=1, heightmap_cache=heightmap_cache)
+    world_data = parse_prompt(user_prompt, args.parser, prompt_cache=prompt_cache, min_confidence=args.min_confidence,
+                              on_field=None if early_heightmaps is None else early_heightmaps.on_field)
     print("User prompt proccessed successfully!")
     print(world_data)
     
@@ -125,6 +199,7 @@ def main():
     # world_data = load_json_config("config.json")    
     # Display Settings 
     tile_size = 24
+    max_window_size = (1280, 800)
     cols, rows = None, None # need to get these from the ASCII map.
 
     # Init World Generator & Create map
@@ -136,7 +211,8 @@ def main():
         map_display_mode = DisplayMode.ASCII_MODE
     
     generate_image = False
-    filename = "temp_filename.png"
+    if args.image:
+        generate_image = True
     
     # If there is one, grab and pass on an INTEGER seed from the JSON
     # to the world generator
@@ -152,42 +228,55 @@ def main():
         print("ERROR: Seed is not a valid data type. Please provide an integer.")
         print("World will be generated WITHOUT a seed.")
         
-    map_generator = WorldGenerator(MapSizes.SMALL_MAP, world_data["biomes"], display_mode=map_display_mode, seed=wg_seed)
+    heightmaps = None if early_heightmaps is None else early_heightmaps.result(world_data.get("biomes"), wg_seed)
+    map_generator = WorldGenerator(map_size, world_data["biomes"], display_mode=map_display_mode, seed=wg_seed,
+                                   heightmap_cache=heightmap_cache, tty_only=args.tty_only)
     # map_generator = WorldGenerator(MapSizes.MEDIUM_MAP, user_params, display_mode=map_display_mode, seed=seed)
-    world_map = map_generator.create_world(roughness=1)
-    
-    if generate_image:
-        save_tilemap_to_png(world_map, tile_size, ascii_color_map, display_mode=map_display_mode, filename=filename)
-        
-    if silent == False:
+    if silent:
+        world_map = map_generator.create_world(roughness=1, heightmaps=heightmaps)
+    else:
+        import pygame
+        from map_renderer import MapViewport, load_font, run_map_viewer
+
         # Set up Pygame Display
         pygame.init()
 
-        # Font Settings (Use a monospaced font)
+        # Font Settings (Use a monospaced font, the path is cached after the first run)
         font_size = 16
-        font = pygame.font.SysFont('Consolas', 30)
+        font = load_font(30)
 
-        window_width = tile_size * map_generator.map_size + 1
-        window_height = tile_size * map_generator.map_size + 1
+        # Big maps get a capped window, the viewer can pan and zoom around them.
+        window_width = min(tile_size * map_generator.width + 1, max_window_size[0])
+        window_height = min(tile_size * map_generator.height + 1, max_window_size[1])
         window = pygame.display.set_mode((window_width, window_height), pygame.RESIZABLE)
         pygame.display.set_caption('ASCII World Generator')
 
-        # Remember: Not using fill will cause the game to write 
-        # frames on top of old ones. Not a desirable effect. 
-        # Is there a better way to manage colors in PyGame?
-        background_color = (0, 0, 0)
-        window.fill(background_color)
-
-        # Game Loop, running kicks off the loop and sustains it until QUIT event.
-        running = True
-        while running:
+        # Show each level of detail as soon as it's ready so there's a rough 
+        # map on screen while the finer levels are still generating.
+        viewport = None
+        for step, world_map in map_generator.create_world_levels(roughness=1, heightmaps=heightmaps):
+            if viewport is None:
+                viewport = MapViewport(world_map, tile_size, font, map_display_mode)
+            viewport.set_map(world_map, level_step=step)
+            viewport.fit_if_needed(window.get_size())
             window.fill((0,0,0))
-            draw_tilemap(window, world_map, tile_size, font, map_display_mode)
+            viewport.draw(window)
             pygame.display.flip()
-            
-            for e in pygame.event.get():
-                if e.type == pygame.QUIT:
-                    running = False
+            pygame.event.pump()
+    
+    if generate_image:
+        if args.png_writer == "headless":
+            png_writer.save_tilemap_to_png(world_map, tile_size, ascii_color_map, display_mode=map_display_mode, filename=args.image)
+        else:
+            from map_renderer import save_tilemap_to_png
+            save_tilemap_to_png(world_map, tile_size, ascii_color_map, display_mode=map_display_mode, filename=args.image)
+
+    if args.map_file:
+        save_map(world_map, filename=args.map_file, seed=wg_seed, biome_params=world_data["biomes"])
+        
+    if silent == False:
+        # Viewer loop, redraws only when the window needs it and runs until QUIT event.
+        run_map_viewer(window, world_map, tile_size, font, map_display_mode, viewport=viewport)
                     
         pygame.quit()
         sys.exit() 
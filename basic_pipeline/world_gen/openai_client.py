@@ -0,0 +1,53 @@
+import os
+
+# The one place OpenAI clients come from. The key is read from ../api/.env once
+# per process and every caller shares one client, so its keep-alive connection
+# pool (and the TLS session in it) stays warm from one prompt to the next
+# instead of being set up again for every request.
+#
+# openai, dotenv and asyncio are only imported the first time they're needed.
+dotenv_path = "../api/.env"
+
+api_keys = {}
+clients = {}
+
+
+# Reads the OpenAI key from dotenv_path (or the environment).
+def get_api_key():
+    if dotenv_path not in api_keys:
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path=dotenv_path)
+        api_keys[dotenv_path] = os.getenv("OPENAI_API_KEY")
+    return api_keys[dotenv_path]
+
+
+# Local stand-ins (base_url set) don't check the key, so they work without one.
+def client_api_key(base_url):
+    api_key = get_api_key()
+    if api_key is None and base_url is not None:
+        return "none"
+    return api_key
+
+
+# Shared openai.OpenAI client. base_url points it at another chat completions
+# API, e.g. chat_stand_in.py.
+def get_client(base_url=None):
+    key = ("sync", base_url)
+    if key not in clients:
+        import openai
+        clients[key] = openai.OpenAI(api_key=client_api_key(base_url), base_url=base_url)
+    return clients[key]
+
+
+# Shared openai.AsyncOpenAI client for the running event loop. Async clients
+# can't be used across event loops, so each asyncio.run gets its own, which is
+# then reused by every request in it. max_retries=0 leaves retrying to the
+# caller.
+def get_async_client(base_url=None, max_retries=0):
+    import asyncio
+    key = ("async", base_url, max_retries)
+    loop = asyncio.get_running_loop()
+    if key not in clients or clients[key][0] is not loop:
+        import openai
+        clients[key] = (loop, openai.AsyncOpenAI(api_key=client_api_key(base_url), base_url=base_url, max_retries=max_retries))
+    return clients[key][1]
@@ -0,0 +1,89 @@
+import struct
+import zlib
+import numpy as np
+from tile_map import as_tile_map
+from world_config import DisplayMode, ascii_color_map
+
+# PNG export with nothing but numpy and zlib, for batch jobs and worker pools
+# where pygame (and SDL with it) shouldn't have to be imported or initialized.
+# save_tilemap_to_png takes the same arguments as the map_renderer one.
+#
+# ASCII mode can't use a system font here, so the terrain symbols come from the
+# small built-in bitmap font below, scaled to the tile size.
+
+# 5x7 bitmaps for the tile symbols, '#' is a lit pixel.
+glyph_bitmaps = {
+    "~": [".....", ".....", ".#...", "#.#.#", "...#.", ".....", "....."],
+    "\"": [".#.#.", ".#.#.", ".#.#.", ".....", ".....", ".....", "....."],
+    ".": [".....", ".....", ".....", ".....", ".....", ".##..", ".##.."],
+    "T": ["#####", "..#..", "..#..", "..#..", "..#..", "..#..", "..#.."],
+    "M": ["#...#", "##.##", "#.#.#", "#.#.#", "#...#", "#...#", "#...#"],
+    "s": [".....", ".....", ".####", "#....", ".###.", "....#", "####."],
+    "8": [".###.", "#...#", "#...#", ".###.", "#...#", "#...#", ".###."],
+    "l": [".##..", "..#..", "..#..", "..#..", "..#..", "..#..", ".###."],
+    "*": [".....", "..#..", "#.#.#", ".###.", "#.#.#", "..#..", "....."],
+}
+# Anything without a bitmap is drawn as a hollow box.
+missing_glyph = ["#####", "#...#", "#...#", "#...#", "#...#", "#...#", "#####"]
+
+
+# Writes an (height, width, 3) uint8 RGB array to filename as a PNG.
+def write_png(filename, pixels):
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape[:2]
+
+    # Every scanline starts with its filter type, 0 (none) here
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = pixels.reshape(height, width * 3)
+
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    with open(filename, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))) # 8 bit RGB
+        f.write(chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+# The map as a (height * tile_size, width * tile_size, 3) RGB array. The tile
+# codes are scaled up first (one byte each) and then run through the palette's
+# color lookup table.
+def map_pixels(tile_map, tile_size, color_mapping=ascii_color_map):
+    codes = tile_map.tiles.repeat(tile_size, axis=0).repeat(tile_size, axis=1)
+    return tile_map.palette_colors(color_mapping)[codes]
+
+
+# Glyph of every palette entry drawn in its color on black, as a
+# (palette size, tile_size, tile_size, 3) array.
+def glyph_tiles(tile_map, tile_size, color_mapping=ascii_color_map):
+    masks = []
+    for symbol in tile_map.symbol_table:
+        bitmap = glyph_bitmaps.get(symbol, missing_glyph)
+        # Leave a pixel of space around the 5x7 glyph, then scale it to the tile
+        mask = np.zeros((9, 7), dtype=bool)
+        mask[1:8, 1:6] = np.array([[pixel == "#" for pixel in row] for row in bitmap])
+        scale = np.arange(tile_size)
+        masks.append(mask[scale * 9 // tile_size][:, scale * 7 // tile_size])
+    colors = tile_map.palette_colors(color_mapping)
+    return np.array(masks)[..., None] * colors[:, None, None, :]
+
+
+# Same as map_pixels, but every tile shows its glyph like ASCII_MODE.
+def map_glyph_pixels(tile_map, tile_size, color_mapping=ascii_color_map):
+    glyphs = glyph_tiles(tile_map, tile_size, color_mapping)[tile_map.tiles] # (rows, cols, tile, tile, 3)
+    return glyphs.swapaxes(1, 2).reshape(tile_map.height * tile_size, tile_map.width * tile_size, 3)
+
+
+def save_tilemap_to_png(tilemap, tile_size, color_mapping, display_mode, filename="tilemap.png"):
+    tile_map = as_tile_map(tilemap)
+    if display_mode == DisplayMode.ASCII_MODE:
+        pixels = map_glyph_pixels(tile_map, tile_size, color_mapping)
+    elif display_mode == DisplayMode.PIXEL_MODE:
+        pixels = map_pixels(tile_map, tile_size, color_mapping)
+    else:
+        print(f"Error: Invalid map render mode provided. Receieved display_mode = {display_mode}")
+        return
+
+    write_png(filename, pixels)
+    print(f"Tilemap saved as {filename}")
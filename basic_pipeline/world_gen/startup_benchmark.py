@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Measures how long main.py takes to start, and to get through a whole --quiet
+# run, since eval runs launch it once per map. Every run is a fresh
+# interpreter, the same as the eval scripts.
+#
+#   python startup_benchmark.py                  # check against startup_target_ms
+#   python startup_benchmark.py --target-ms 300  # check against another target
+#
+# Exits with 1 if importing main or the quiet run takes longer than the target,
+# or if main imports any of lazy_modules (they should only be imported on the
+# paths that use them).
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Time for a fresh interpreter to import main, or to run quiet_run_args start
+# to finish, interpreter start up included. Most of the import is numpy, which
+# the generator can't do without.
+startup_target_ms = 250
+
+# An end-to-end run that needs no network: the offline parser, no viewer, and
+# an unseeded world so it's generated every time rather than read from the cache.
+quiet_run_args = ["main.py", "--prompt", "desert in the north and mountains in the south", "--quiet", "--parser", "local"]
+
+lazy_modules = ["pygame", "openai", "dotenv", "map_renderer"]
+
+
+# Best wall time out of repeat fresh interpreters run with args.
+def time_python(args, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=script_dir, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Which of lazy_modules end up imported by a plain "import main".
+def eagerly_imported_modules():
+    code = f"import json, sys, main; print(json.dumps([m for m in {lazy_modules!r} if m in sys.modules]))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=script_dir, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark how long main.py takes to start.")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per measurement, the best one is kept.")
+    parser.add_argument("--target-ms", type=float, default=startup_target_ms,
+                        help=f"Fail when importing main or a quiet run takes longer than this (default: {startup_target_ms} ms).")
+    args = parser.parse_args()
+
+    interpreter_seconds = time_python(["-c", "pass"], args.repeat)
+    import_seconds = time_python(["-c", "import main"], args.repeat)
+    run_seconds = time_python(quiet_run_args, args.repeat)
+    print(f"{'interpreter start up':<30} {interpreter_seconds * 1000:>10.2f} ms")
+    print(f"{'import main':<30} {import_seconds * 1000:>10.2f} ms  (target {args.target_ms:.0f} ms)")
+    print(f"{'main.py import overhead':<30} {(import_seconds - interpreter_seconds) * 1000:>10.2f} ms")
+    print(f"{'main.py --quiet --parser local':<30} {run_seconds * 1000:>10.2f} ms  (target {args.target_ms:.0f} ms)")
+
+    failures = []
+    if import_seconds * 1000 > args.target_ms:
+        failures.append(f"importing main took {import_seconds * 1000:.2f} ms, the target is {args.target_ms:.0f} ms")
+    if run_seconds * 1000 > args.target_ms:
+        failures.append(f"a quiet run took {run_seconds * 1000:.2f} ms, the target is {args.target_ms:.0f} ms")
+    eager_modules = eagerly_imported_modules()
+    if eager_modules:
+        failures.append(f"importing main also imports {', '.join(eager_modules)}")
+
+    if failures:
+        print(f"\n{len(failures)} startup problem(s):")
+        for failure in failures:
+            print("  " + failure)
+        return 1
+    print("\nStartup is within the target")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import sys
+import numpy as np
+from ascii_tile import ANSI_RESET
+from tile_map import as_tile_map
+
+# Prints maps to the terminal. The whole map is built as one string first and
+# each row only gets a color code where the color changes, instead of a color
+# code and a reset around every single tile.
+
+
+# Returns the map as one string of ANSI colored rows.
+def render_ansi(world_map):
+    tile_map = as_tile_map(world_map)
+    palette_colors = [tile.color or ANSI_RESET for tile in tile_map.palette]
+
+    # Tiles that share a color share a color id, so runs can span different symbols
+    color_ids = {color: i for i, color in enumerate(dict.fromkeys(palette_colors))}
+    palette_color_ids = np.array([color_ids[color] for color in palette_colors], dtype=np.intp)
+    id_colors = list(color_ids)
+
+    lines = []
+    for codes in tile_map.tiles:
+        row_color_ids = palette_color_ids[codes]
+        symbols = tile_map.symbol_table[codes].tolist()
+        run_starts = [0] + (np.flatnonzero(np.diff(row_color_ids)) + 1).tolist()
+        run_ends = run_starts[1:] + [len(symbols)]
+
+        line = []
+        for start, end in zip(run_starts, run_ends):
+            line.append(id_colors[row_color_ids[start]])
+            line.append("".join(symbols[start:end]))
+        line.append(ANSI_RESET)
+        lines.append("".join(line))
+    return "\n".join(lines) + "\n"
+
+
+# Prints the map with a single write. With only_tty=True nothing is rendered at
+# all when the output isn't a terminal (e.g. piped to a file in a batch job).
+def print_tilemap(world_map, stream=None, only_tty=False):
+    stream = sys.stdout if stream is None else stream
+    if only_tty and not stream.isatty():
+        return
+    stream.write(render_ansi(world_map))
+    stream.flush()
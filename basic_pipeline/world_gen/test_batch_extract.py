@@ -0,0 +1,65 @@
+import asyncio
+import openai
+from batch_extract import extract_world_data_batch_async
+from chat_stand_in import start_stand_in
+from main import model_name, system_message
+from prompt_cache import PromptCache
+from prompt_parser import parse_world_prompt
+
+# Run with: python -m pytest test_batch_extract.py
+# Runs the batch extractor against chat_stand_in.py, which fails half of the
+# requests. 20 retries with a tiny base delay make it all but certain every
+# prompt gets through, without the backoff adding up to much.
+
+unique_prompts = [f"{biome} in the {region}" for biome in ("desert", "ocean", "forest", "tundra")
+                  for region in ("north", "south", "east", "west")]
+prompts = unique_prompts + unique_prompts[::3]
+
+
+# Wraps the client's create call to count requests and the failures among them.
+def counting_client(base_url, counts):
+    client = openai.AsyncOpenAI(api_key="none", base_url=base_url, max_retries=0)
+    create = client.chat.completions.create
+
+    async def counted_create(**kwargs):
+        counts["requests"] += 1
+        try:
+            return await create(**kwargs)
+        except openai.APIStatusError:
+            counts["failures"] += 1
+            raise
+    client.chat.completions.create = counted_create
+    return client
+
+
+def run_batch(base_url, prompt_cache, counts):
+    async def run():
+        return await extract_world_data_batch_async(prompts, max_concurrency=8, requests_per_second=1000,
+                                                    max_retries=20, base_delay=0.0001, prompt_cache=prompt_cache,
+                                                    client=counting_client(base_url, counts))
+    return asyncio.run(run())
+
+
+def test_batch_against_failing_stand_in(tmp_path):
+    server = start_stand_in(latency=0.01, failure_rate=0.5)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    prompt_cache = PromptCache(cache_dir=str(tmp_path))
+    try:
+        counts = {"requests": 0, "failures": 0}
+        results = run_batch(base_url, prompt_cache, counts)
+
+        # In order, one answer per prompt, repeats included
+        assert results == [parse_world_prompt(prompt)[0] for prompt in prompts]
+        # Every failure was retried, and repeated prompts only went out once
+        assert counts["failures"] > 0
+        assert counts["requests"] - counts["failures"] == len(unique_prompts)
+        # Every answer is in the prompt cache
+        for prompt in unique_prompts:
+            assert prompt_cache.get(prompt_cache.make_key(prompt, system_message, model_name)) == parse_world_prompt(prompt)[0]
+
+        # So the next run doesn't send anything
+        counts = {"requests": 0, "failures": 0}
+        assert run_batch(base_url, prompt_cache, counts) == results
+        assert counts["requests"] == 0
+    finally:
+        server.shutdown()
@@ -0,0 +1,43 @@
+import numpy as np
+from chunked_world import ChunkedWorldGenerator
+from diamond_square import smooth_biome_transitions
+
+# Run with: python -m pytest test_chunked_world.py
+
+user_params = {'north': 'water', 'center': 'forest', 'east': 'desert'}
+chunk_size = 16
+
+
+def make_generator():
+    return ChunkedWorldGenerator(64, user_params, chunk_size=chunk_size, seed=7)
+
+
+def test_neighbouring_chunks_share_their_edges():
+    generator = make_generator()
+    _, heights = generator.raw_chunks.get_or_create((0, 0), generator.create_raw_chunk)
+    _, right = generator.raw_chunks.get_or_create((1, 0), generator.create_raw_chunk)
+    _, below = generator.raw_chunks.get_or_create((0, 1), generator.create_raw_chunk)
+    assert np.array_equal(heights[:, chunk_size], right[:, 0])
+    assert np.array_equal(heights[chunk_size, :], below[0, :])
+
+
+# Smoothing chunk by chunk has to give what smoothing the stitched raw chunks
+# in one pass does. The running sums add up in a different order on the bigger
+# array, hence allclose rather than exact equality.
+def test_chunk_seams_match_a_whole_map_pass():
+    generator = make_generator()
+    region = generator.get_region(0, 0, 3 * chunk_size, 3 * chunk_size)
+
+    # Raw chunks -1 to 3 each way, so the whole-map pass has the same ring around the region
+    size = chunk_size
+    biome_mask = np.zeros((5 * size, 5 * size), dtype=np.uint8)
+    height_map = np.zeros((5 * size, 5 * size))
+    for chunk_y in range(-1, 4):
+        for chunk_x in range(-1, 4):
+            mask, heights = generator.raw_chunks.get_or_create((chunk_x, chunk_y), generator.create_raw_chunk)
+            cells = (slice((chunk_y + 1) * size, (chunk_y + 2) * size), slice((chunk_x + 1) * size, (chunk_x + 2) * size))
+            biome_mask[cells] = mask[:size, :size]
+            height_map[cells] = heights[:size, :size]
+    whole_map = smooth_biome_transitions(biome_mask, height_map)[size:4 * size, size:4 * size]
+
+    assert np.allclose(region.heights, whole_map, rtol=0, atol=1e-12)
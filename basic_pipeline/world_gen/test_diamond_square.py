@@ -0,0 +1,57 @@
+import numpy as np
+from biome_mask import create_biome_mask
+from diamond_square import biome_height_offsets, biome_roughness, generate_heightmap_w_biome_mask
+from world_config import Biome
+
+# Run with: python -m pytest test_diamond_square.py
+
+user_params = {'north': 'water', 'south': 'mountains', 'center': 'forest', 'east': 'desert', 'northwest': 'tundra'}
+
+
+# The per-cell loop generate_heightmap_w_biome_mask used before it was
+# vectorized, kept here so exact mode can be checked against it.
+def loop_heightmap(size, biome_mask, seed, base_roughness=0.5, base_height_offset=0.1):
+    rng = np.random.default_rng(seed)
+    grid = np.zeros((size, size))
+    grid[0, 0] = grid[0, -1] = grid[-1, 0] = grid[-1, -1] = rng.uniform(0, 1)
+
+    def params(biome):
+        return (biome_roughness.get(Biome(biome), base_roughness),
+                biome_height_offsets.get(Biome(biome), base_height_offset))
+
+    step = size - 1
+    while step > 1:
+        half = step // 2
+        for x in range(0, size - 1, step):
+            for y in range(0, size - 1, step):
+                roughness, offset = params(biome_mask[x + half, y + half])
+                avg = (grid[x, y] + grid[x + step, y] + grid[x, y + step] + grid[x + step, y + step]) / 4.0
+                grid[x + half, y + half] = avg + rng.uniform(-roughness, roughness) + offset
+        for x in range(0, size, half):
+            for y in range((x + half) % step, size, step):
+                roughness, offset = params(biome_mask[x % size, y % size])
+                neighbors = []
+                if x - step >= 0:
+                    neighbors.append(grid[x - step, y])
+                if x + step < size:
+                    neighbors.append(grid[x + step, y])
+                if y - step >= 0:
+                    neighbors.append(grid[x, y - step])
+                if y + step < size:
+                    neighbors.append(grid[x, y + step])
+                grid[x, y] = np.mean(neighbors) + rng.uniform(-roughness, roughness) + offset
+        step = half
+    return grid
+
+
+def test_exact_mode_matches_the_loop():
+    for size, seed in ((9, 3), (33, 1234), (65, 42)):
+        biome_mask = create_biome_mask(size, user_params)
+        expected = loop_heightmap(size, biome_mask, seed)
+        assert np.array_equal(generate_heightmap_w_biome_mask(size, biome_mask, seed=seed), expected)
+
+
+def test_seeded_heightmaps_repeat():
+    biome_mask = create_biome_mask(33, user_params)
+    first = generate_heightmap_w_biome_mask(33, biome_mask, seed=7, exact=False)
+    assert np.array_equal(first, generate_heightmap_w_biome_mask(33, biome_mask, seed=7, exact=False))
@@ -0,0 +1,34 @@
+import os
+import numpy as np
+from heightmap_cache import HeightmapCache, default_cache_dir
+from world_generator import WorldGenerator
+
+# Run with: python -m pytest test_heightmap_cache.py
+
+
+def test_key_keeps_region_order(tmp_path):
+    cache = HeightmapCache(cache_dir=str(tmp_path))
+    first = cache.make_key((33, 33), {'north': 'water', 'northeast': 'desert'}, 0.5, 5)
+    second = cache.make_key((33, 33), {'northeast': 'desert', 'north': 'water'}, 0.5, 5)
+    assert first != second
+
+
+# Later regions paint over earlier ones, so swapping them changes the world
+# and the cache mustn't hand back the first one for the second.
+def test_reordered_params_are_not_served_from_cache(tmp_path):
+    cache = HeightmapCache(cache_dir=str(tmp_path))
+    for user_params in ({'north': 'water', 'northeast': 'desert'},
+                        {'northeast': 'desert', 'north': 'water'}):
+        cached = WorldGenerator(33, user_params, seed=5, heightmap_cache=cache).load_or_generate_heightmaps(0.5)
+        uncached = WorldGenerator(33, user_params, seed=5).generate_heightmaps(0.5)
+        for cached_array, uncached_array in zip(cached, uncached):
+            assert np.array_equal(cached_array, uncached_array)
+
+
+# proc_painter has its own copy of this module, with its own cache_version.
+def test_packages_get_their_own_cache_dirs(tmp_path):
+    other_package = tmp_path / "proc_painter" / "v1"
+    other_package.mkdir(parents=True)
+    HeightmapCache(cache_dir=str(tmp_path / "world_gen"))
+    assert other_package.is_dir()
+    assert os.path.basename(default_cache_dir) == "world_gen"
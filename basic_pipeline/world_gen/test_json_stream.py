@@ -0,0 +1,54 @@
+import json
+import pytest
+from json_stream import JSONFieldStream
+
+# Run with: python -m pytest test_json_stream.py
+
+world_data = {"biomes": {"north": "water", "center": "forest"},
+              "temperature": {"north": "cold", "center": "warm"},
+              "note": "a \"quoted\" word, a } brace, a \\ backslash and a é",
+              "regions": [["north", {"depth": [1, 2]}], []],
+              "seed": 42,
+              "ready": True,
+              "map_size": None}
+
+
+# Feeds text to a new stream chunk_size characters at a time.
+def stream_fields(text, chunk_size):
+    fields = JSONFieldStream()
+    completed = []
+    for i in range(0, len(text), chunk_size):
+        completed.extend(fields.feed(text[i:i + chunk_size]))
+    return fields, completed
+
+
+def test_fields_arrive_whole_in_any_chunking():
+    text = json.dumps(world_data)
+    for chunk_size in (1, 2, 3, 7, len(text)):
+        fields, completed = stream_fields(text, chunk_size)
+        assert completed == list(world_data.items())
+        assert fields.done
+        assert fields.value() == world_data
+
+
+def test_biomes_arrive_before_the_rest():
+    text = json.dumps(world_data)
+    fields = JSONFieldStream()
+    biomes_end = text.index("}") + 1
+    assert fields.feed(text[:biomes_end + 1]) == [("biomes", world_data["biomes"])]
+    assert not fields.done
+
+
+def test_code_fences_are_skipped():
+    text = "```json\n" + json.dumps(world_data, indent=2) + "\n```"
+    fields, completed = stream_fields(text, 5)
+    assert dict(completed) == world_data
+    assert fields.value() == world_data
+
+
+def test_value_waits_for_the_whole_object():
+    fields = JSONFieldStream()
+    fields.feed('{"seed": 1, "biomes": {"north"')
+    assert not fields.done
+    with pytest.raises(ValueError):
+        fields.value()
@@ -0,0 +1,63 @@
+import numpy as np
+from ascii_tile import terrain_tiles
+from map_file import block_alignment, header_prefix, load_map, map_magic, read_map_header, save_map
+from world_generator import WorldGenerator
+
+# Run with: python -m pytest test_map_file.py
+
+user_params = {'north': 'water', 'center': 'forest'}
+
+
+def make_world(size=(37, 21)):
+    return WorldGenerator(size, user_params, seed=11).create_world()
+
+
+def test_round_trip(tmp_path):
+    world_map = make_world()
+    filename = str(tmp_path / "world.ppmap")
+    save_map(world_map, filename, seed=11, biome_params=user_params)
+
+    map_file = load_map(filename)
+    assert (map_file.width, map_file.height, map_file.seed) == (37, 21, 11)
+    assert map_file.biome_params == user_params
+    assert map_file.tile_map.palette is terrain_tiles
+    assert np.array_equal(map_file.tiles, world_map.tiles)
+    assert np.array_equal(map_file.heights, world_map.heights.astype(np.float16))
+
+
+def test_blocks_are_aligned_and_memory_mapped(tmp_path):
+    filename = str(tmp_path / "world.ppmap")
+    save_map(make_world(), filename)
+
+    header = read_map_header(filename)
+    assert header["tiles_offset"] % block_alignment == 0
+    assert header["heights_offset"] % block_alignment == 0
+    assert header["tiles_offset"] >= header_prefix.size
+
+    map_file = load_map(filename)
+    assert isinstance(map_file.tiles, np.memmap) and map_file.tiles.dtype == np.uint8
+    assert isinstance(map_file.heights, np.memmap) and map_file.heights.dtype == np.float16
+    assert map_file.tiles.offset == header["tiles_offset"]
+    assert map_file.heights.offset == header["heights_offset"]
+
+
+def test_heights_can_be_left_out(tmp_path):
+    world_map = make_world()
+    filename = str(tmp_path / "world.ppmap")
+    save_map(world_map, filename, include_heights=False)
+
+    map_file = load_map(filename)
+    assert map_file.heights is None
+    assert np.array_equal(map_file.tiles, world_map.tiles)
+
+
+def test_bad_magic_is_rejected(tmp_path):
+    filename = tmp_path / "world.ppmap"
+    save_map(make_world(), str(filename))
+    data = filename.read_bytes()
+    filename.write_bytes(b"NOTMP" + data[len(map_magic):])
+    assert load_map(str(filename)) is None
+
+    short_file = tmp_path / "short.ppmap"
+    short_file.write_bytes(b"PP")
+    assert load_map(str(short_file)) is None
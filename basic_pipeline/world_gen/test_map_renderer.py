@@ -0,0 +1,63 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+from map_renderer import MapViewport
+from tile_map import TileMap
+from world_config import DisplayMode
+
+# Run with: python -m pytest test_map_renderer.py
+
+window_size = (64, 48)
+
+
+def make_viewport(display_mode=DisplayMode.PIXEL_MODE):
+    tiles = np.random.default_rng(3).integers(0, 6, size=(200, 300), dtype=np.uint8)
+    viewport = MapViewport(TileMap(tiles), 4, None, display_mode)
+    viewport.window_size = window_size
+    return viewport
+
+
+def draw(viewport):
+    window = pygame.Surface(window_size)
+    viewport.draw(window)
+    return pygame.surfarray.array3d(window)
+
+
+# A viewport that starts from scratch on every frame, to compare against.
+def fresh_draw(viewport):
+    fresh = MapViewport(viewport.tile_map, 4, None, viewport.display_mode)
+    fresh.window_size = window_size
+    fresh.zoom, fresh.x, fresh.y = viewport.zoom, viewport.x, viewport.y
+    return draw(fresh)
+
+
+def test_small_pans_reuse_the_composed_surface():
+    viewport = make_viewport()
+    draw(viewport)
+    surface = viewport.surface_cache[5]
+    viewport.pan(8, 4)
+    assert np.array_equal(draw(viewport), fresh_draw(viewport))
+    assert viewport.surface_cache[5] is surface
+
+
+def test_far_pans_and_zooms_compose_again():
+    viewport = make_viewport()
+    draw(viewport)
+    surface = viewport.surface_cache[5]
+    viewport.pan(400, 0)
+    assert np.array_equal(draw(viewport), fresh_draw(viewport))
+    assert viewport.surface_cache[5] is not surface
+
+    surface = viewport.surface_cache[5]
+    viewport.zoom_by(-1)
+    assert np.array_equal(draw(viewport), fresh_draw(viewport))
+    assert viewport.surface_cache[5] is not surface
+
+
+def test_invalidate_picks_up_edits():
+    viewport = make_viewport()
+    draw(viewport)
+    viewport.tile_map.tiles[:] = 0
+    viewport.invalidate()
+    assert np.array_equal(draw(viewport), fresh_draw(viewport))
@@ -0,0 +1,63 @@
+import os
+from prompt_cache import PromptCache, cached_extract
+
+# Run with: python -m pytest test_prompt_cache.py
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, **kwargs):
+    clock = FakeClock()
+    return PromptCache(cache_dir=str(tmp_path), clock=clock, **kwargs), clock
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache, clock = make_cache(tmp_path, ttl_seconds=60)
+    cache.put("a", {"biomes": {"north": "water"}})
+    clock.now += 59
+    assert cache.get("a") == {"biomes": {"north": "water"}}
+    clock.now += 2 # expiry counts from when it was stored, not last used
+    assert cache.get("a") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_entries_go_first(tmp_path):
+    world_data = {"biomes": {"north": "water"}, "padding": "x" * 200}
+    cache, clock = make_cache(tmp_path)
+    cache.put("a", world_data)
+    entry_bytes = os.path.getsize(os.path.join(tmp_path, "a.json"))
+    cache.max_bytes = 3 * entry_bytes
+
+    for key in ("b", "c"):
+        clock.now += 1
+        cache.put(key, world_data)
+    clock.now += 1
+    assert cache.get("a") is not None # a is now the most recently used
+
+    clock.now += 1
+    cache.put("d", world_data) # one over, b goes
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json", "d.json"]
+    assert cache.get("b") is None
+
+
+def test_expired_entries_go_on_eviction(tmp_path):
+    cache, clock = make_cache(tmp_path, ttl_seconds=60)
+    cache.put("old", {"seed": 1})
+    clock.now += 61
+    cache.put("new", {"seed": 2})
+    assert os.listdir(tmp_path) == ["new.json"]
+
+
+def test_errors_are_not_cached(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    calls = []
+    extract = lambda prompt: calls.append(prompt) or {"error": "rate limited"}
+    for _ in range(2):
+        assert cached_extract(cache, "desert in the north", "system", "model", extract) == {"error": "rate limited"}
+    assert len(calls) == 2
@@ -0,0 +1,43 @@
+import numpy as np
+from biome_mask import create_biome_mask
+from prompt_parser import parse_world_prompt
+from world_config import biome_dict
+
+# Run with: python -m pytest test_prompt_parser.py
+# These check the biome mask the parsed prompt turns into, since
+# create_biome_mask paints the regions in order and the dict alone can look
+# right while later regions cover up earlier ones.
+
+size = 30
+
+
+def parse_mask(prompt):
+    world_data, confidence = parse_world_prompt(prompt)
+    return create_biome_mask(size, world_data["biomes"]), confidence
+
+
+def test_north_covers_the_whole_top_band():
+    mask, confidence = parse_mask("desert in the north")
+    assert confidence == 1.0
+    assert np.all(mask[:size // 3] == biome_dict['desert'].value)
+    assert np.all(mask[size // 3:] == biome_dict['plains'].value)
+
+
+def test_unmentioned_regions_are_left_out():
+    world_data, _ = parse_world_prompt("ocean in the east and tundra in the top left")
+    assert world_data["biomes"] == {'east': 'water', 'northwest': 'tundra'}
+
+
+def test_sides_and_bands_both_show():
+    mask, _ = parse_mask("mountains in the north and south, desert in the west")
+    assert np.all(mask[:size // 3] == biome_dict['mountains'].value)
+    assert np.all(mask[-size // 3:] == biome_dict['mountains'].value)
+    assert np.all(mask[size // 3:-size // 3, :-size // 3] == biome_dict['desert'].value)
+    assert np.all(mask[size // 3:-size // 3, -size // 3:] == biome_dict['plains'].value)
+
+
+def test_background_goes_under_the_placed_regions():
+    mask, _ = parse_mask("a forest with a lake in the center")
+    assert mask[size // 2, size // 2] == biome_dict['water'].value
+    assert mask[0, 0] == biome_dict['forest'].value
+    assert not np.any(mask == biome_dict['plains'].value)
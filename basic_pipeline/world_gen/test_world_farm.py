@@ -0,0 +1,39 @@
+import numpy as np
+from world_farm import farm_worlds
+
+# Run with: python -m pytest test_world_farm.py
+
+
+def test_farming_no_worlds():
+    with farm_worlds([], 17, master_seed=1) as farm:
+        assert farm.height_maps.shape == (0, 17, 17)
+        assert farm.failed == []
+
+
+def test_failed_worlds_are_recorded():
+    user_params_list = [{'north': 'water'}, {'nowhere': 'water'}, {'center': 'desert'}]
+    with farm_worlds(user_params_list, 17, master_seed=1, max_workers=2, batch_size=1) as farm:
+        assert farm.failed == [1]
+        assert farm.height_maps[0].any() and farm.height_maps[2].any()
+
+
+# One bad spec mustn't take the rest of its batch down with it.
+def test_bad_world_only_fails_itself():
+    user_params_list = [{'north': 'water'}, {'nowhere': 'water'}, {'center': 'desert'}]
+    with farm_worlds(user_params_list, 17, master_seed=1, max_workers=1) as farm, \
+         farm_worlds(user_params_list[:1], 17, master_seed=1, max_workers=1) as first_only:
+        assert farm.failed == [1]
+        assert not farm.height_maps[1].any()
+        assert np.array_equal(farm.height_maps[0], first_only.height_maps[0])
+        assert farm.height_maps[2].any()
+
+
+# Every world's seed comes from its index, so neither the number of workers
+# nor the batch size may change what comes out.
+def test_output_does_not_depend_on_workers():
+    user_params_list = [{'north': 'water', 'south': 'mountains'}, {'center': 'forest', 'east': 'desert'}] * 3
+    with farm_worlds(user_params_list, 33, master_seed=42, max_workers=1, batch_size=6) as one_worker, \
+         farm_worlds(user_params_list, 33, master_seed=42, max_workers=3, batch_size=1) as three_workers:
+        assert one_worker.seeds == three_workers.seeds
+        assert np.array_equal(one_worker.height_maps, three_workers.height_maps)
+        assert np.array_equal(one_worker.terrain, three_workers.terrain)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from ascii_tile import terrain_tiles
+from world_generator import WorldGenerator
+
+# Run with: python -m pytest test_world_generator.py
+
+
+def test_thresholds_must_match_the_palette():
+    with pytest.raises(ValueError):
+        WorldGenerator(9, {}, terrain_thresholds=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6])
+    with pytest.raises(ValueError):
+        WorldGenerator(9, {}, terrain_thresholds=[0.5])
+
+
+def test_custom_thresholds_stay_on_the_palette():
+    generator = WorldGenerator(9, {}, terrain_thresholds=[-1.0, -0.5, 0.0, 0.5, 1.0])
+    tiles = generator.heightmap_to_tiles(np.linspace(-2, 2, 81).reshape(9, 9))
+    assert tiles.min() == 0 and tiles.max() == len(terrain_tiles) - 1
+
+
+# The viewer path uses create_world_levels, it has to print the finished map
+# to the terminal just like create_world.
+def test_levels_print_the_finished_world(capsys):
+    generator = WorldGenerator(33, {'north': 'water'}, seed=3)
+    generator.create_world()
+    printed = capsys.readouterr().out
+    levels = list(generator.create_world_levels())
+    assert levels[-1][0] == 1
+    printed_levels = capsys.readouterr().out
+    map_text = printed[printed.index("\033"):]
+    assert printed_levels.endswith(map_text)
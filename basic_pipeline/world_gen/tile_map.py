@@ -0,0 +1,108 @@
+import numpy as np
+from ascii_tile import terrain_tiles
+from world_config import ascii_color_map
+
+# A generated world. Instead of a list of lists of ASCIITiles, a TileMap keeps one
+# uint8 code per tile in a (height, width) array plus a palette of the ASCIITiles
+# those codes stand for (terrain_tiles by default), and optionally the heights
+# the tiles were classified from.
+#
+# It still iterates and indexes like the old nested lists (world_map[y][x] is an
+# ASCIITile), but renderers and exporters should use the array accessors, which
+# look things up for the whole map in one go.
+class TileMap():
+    __slots__ = ("tiles", "heights", "palette", "symbol_table", "color_table")
+
+    def __init__(self, tiles, heights=None, palette=terrain_tiles):
+        self.tiles = np.asarray(tiles, dtype=np.uint8)
+        self.heights = heights
+        self.palette = palette
+        self.symbol_table = np.array([tile.raw_symbol for tile in palette])
+        self.color_table = {}
+
+    # Builds a TileMap from the old list of lists of ASCIITiles. Every distinct
+    # tile gets its own code.
+    @classmethod
+    def from_tiles(cls, rows):
+        codes = {}
+        palette = []
+        tiles = np.empty((len(rows), len(rows[0]) if len(rows) else 0), dtype=np.uint8)
+        for y, row in enumerate(rows):
+            for x, tile in enumerate(row):
+                if id(tile) not in codes:
+                    codes[id(tile)] = len(palette)
+                    palette.append(tile)
+                tiles[y, x] = codes[id(tile)]
+        palette_array = np.empty(len(palette), dtype=object)
+        palette_array[:] = palette
+        return cls(tiles, palette=palette_array)
+
+    @property
+    def width(self):
+        return self.tiles.shape[1]
+
+    @property
+    def height(self):
+        return self.tiles.shape[0]
+
+    @property
+    def shape(self):
+        return self.tiles.shape
+
+    # Raw (uncolored) symbol for every tile, as a (height, width) array of strings.
+    def symbols(self):
+        return self.symbol_table[self.tiles]
+
+    # ANSI colored symbol for every tile, for printing to a terminal.
+    def ansi_symbols(self):
+        return np.array([tile.symbol or tile.raw_symbol for tile in self.palette])[self.tiles]
+
+    # RGB color for every tile as a (height, width, 3) uint8 array. Symbols
+    # missing from color_mapping are drawn white.
+    def colors(self, color_mapping=ascii_color_map):
+        return self.palette_colors(color_mapping)[self.tiles]
+
+    # RGB color of each palette entry, so callers can do their own lookups.
+    # Cached on the colors themselves rather than the mapping object, whose id
+    # can be reused by another dict once it's gone.
+    def palette_colors(self, color_mapping=ascii_color_map):
+        key = tuple(tuple(color_mapping.get(symbol, (255, 255, 255))) for symbol in self.symbol_table)
+        if key not in self.color_table:
+            self.color_table[key] = np.array(key, dtype=np.uint8).reshape(-1, 3)
+        return self.color_table[key]
+
+    # Rows y to y + height and columns x to x + width, as a TileMap sharing this
+    # one's arrays (nothing is copied). With step > 1 only every step-th row and
+    # column is kept, which gives zoomed out views for free.
+    def region(self, x, y, width, height, step=1):
+        area = (slice(y, y + height, step), slice(x, x + width, step))
+        heights = None if self.heights is None else self.heights[area]
+        region = TileMap.__new__(TileMap)
+        region.tiles = self.tiles[area]
+        region.heights = heights
+        region.palette = self.palette
+        region.symbol_table = self.symbol_table
+        region.color_table = self.color_table
+        return region
+
+    # A single row as a 1 x width TileMap view.
+    def row(self, y):
+        return self.region(0, y, self.width, 1)
+
+    # The old nested list interface, world_map[y][x] gives an ASCIITile.
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        return self.palette[self.tiles[y]]
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self.palette[self.tiles[y]]
+
+
+# Lets functions take either a TileMap or the old list of lists of ASCIITiles.
+def as_tile_map(world_map):
+    if isinstance(world_map, TileMap):
+        return world_map
+    return TileMap.from_tiles(world_map)
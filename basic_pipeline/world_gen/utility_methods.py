@@ -10,6 +10,10 @@ def print_grid(grid):
     elif isinstance(grid, np.ndarray) and isinstance(grid[0][0], Biome): 
         for row in grid:
                 print(" ".join(str(cell.value) for cell in row))
+    # Print integer grids (e.g. biome masks of Biome.value codes)
+    elif isinstance(grid, np.ndarray) and np.issubdtype(grid.dtype, np.integer):
+        for row in grid:
+                print(" ".join(str(cell) for cell in row))
     # Print ints and any other data type
     else: 
         for row in grid:
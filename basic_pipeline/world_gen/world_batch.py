@@ -0,0 +1,59 @@
+import numpy as np
+from ascii_tile import classify_heights
+from biome_mask import create_biome_mask
+from diamond_square import generate_heightmap_stack, smooth_biome_transitions
+from terminal_renderer import print_tilemap
+from tile_map import TileMap
+from world_config import MapSizes, map_dimensions
+
+# Generates a batch of same-sized worlds as one (N, height, width) stack, so
+# the heightmap, smoothing and ASCII stages each run once for the whole batch
+# instead of once per world.
+# world_specs is a list of (user_params, seed) pairs. Each world matches what
+# WorldGenerator(map_size, user_params, seed=seed).create_world(roughness) makes.
+# Returns the stacked biome masks, smoothed heightmaps and a list of TileMaps,
+# ascii_worlds[i] can be passed to the renderers like any other world map.
+def generate_worlds(world_specs, map_size, roughness=0.5, exact=True):
+    world_stack = generate_world_stack(world_specs, map_size, roughness, exact)
+    if world_stack is None:
+        return None
+    biome_masks, smoothed_hms, terrain = world_stack
+    return biome_masks, smoothed_hms, [TileMap(tiles, heights) for tiles, heights in zip(terrain, smoothed_hms)]
+
+
+# Same as generate_worlds, but the terrain comes back as a uint8 stack of
+# indexes into terrain_tiles instead of ASCIITiles.
+def generate_world_stack(world_specs, map_size, roughness=0.5, exact=True):
+    width, height = map_dimensions(map_size)
+    print(f"Generating {len(world_specs)} worlds ({width}x{height})")
+
+    biome_masks = []
+    for user_params, _ in world_specs:
+        biome_mask = create_biome_mask((width, height), user_params)
+        if biome_mask is None:
+            print("Error: Could not create a biome mask for ", user_params)
+            return None
+        biome_masks.append(biome_mask)
+    return generate_mask_stack(np.stack(biome_masks), [seed for _, seed in world_specs], roughness, exact)
+
+
+# The rest of generate_world_stack, for biome masks that are already made.
+# biome_masks is an (N, height, width) stack with one seed per mask.
+def generate_mask_stack(biome_masks, seeds, roughness=0.5, exact=True):
+    height, width = biome_masks.shape[1:]
+    rngs = [np.random.default_rng(seed) if seed else np.random.default_rng() for seed in seeds]
+    height_maps = generate_heightmap_stack((width, height), biome_masks, rngs, roughness, exact=exact)
+    smoothed_hms = smooth_biome_transitions(biome_masks, height_maps)
+    terrain = classify_heights(smoothed_hms)
+    return biome_masks, smoothed_hms, terrain
+
+
+if __name__ == "__main__":
+    world_specs = [({'north': 'water', 'south': 'mountains'}, 1),
+                   ({'center': 'forest', 'east': 'desert'}, 2),
+                   ({'southwest': 'mountains', 'northeast': 'water'}, 3)]
+    _, _, ascii_worlds = generate_worlds(world_specs, MapSizes.SMALL_MAP)
+
+    for ascii_world in ascii_worlds:
+        print_tilemap(ascii_world)
+        print()
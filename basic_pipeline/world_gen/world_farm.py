@@ -0,0 +1,131 @@
+import contextlib
+import io
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from png_writer import map_pixels, write_png
+from terminal_renderer import print_tilemap
+from tile_map import TileMap
+from biome_mask import create_biome_mask
+from world_batch import generate_mask_stack
+from world_config import MapSizes, map_dimensions
+
+# Mass world generation spread over a process pool.
+#
+# Every world gets its own seed spawned from the master seed by its index, so
+# the worlds don't change with the number of workers or how the work is split.
+# Workers write their heightmaps and terrain codes straight into shared memory
+# blocks made by the parent, nothing but a few small tuples gets pickled.
+
+
+# Holds the farm output. height_maps (float64) and terrain (uint8 indexes into
+# terrain_tiles) are (N, height, width) arrays backed by shared memory, so call
+# close() (or use it in a with block) once you are done with them. failed lists
+# the indexes of worlds that couldn't be generated, their slots are left as
+# zeros and aren't real worlds.
+class FarmResult():
+    def __init__(self, seeds, shape):
+        self.seeds = seeds
+        self.failed = []
+        # Shared memory blocks can't be empty, so farming no worlds still gets one byte
+        self.heights_block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+        self.terrain_block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)), 1))
+        self.height_maps = np.ndarray(shape, dtype=np.float64, buffer=self.heights_block.buf)
+        self.terrain = np.ndarray(shape, dtype=np.uint8, buffer=self.terrain_block.buf)
+
+    # TileMap for one world, ready for the renderers. It is a view into the
+    # shared memory, so it goes away with close() too.
+    def ascii_world(self, index):
+        return TileMap(self.terrain[index], self.height_maps[index])
+
+    # Saves a PIXEL_MODE png of every generated world in directory as world_<index>.png.
+    def save_thumbnails(self, directory, tile_size=1):
+        os.makedirs(directory, exist_ok=True)
+        for index in range(len(self.seeds)):
+            if index in self.failed:
+                continue
+            write_png(os.path.join(directory, f"world_{index:05d}.png"), map_pixels(self.ascii_world(index), tile_size))
+
+    def close(self):
+        # The arrays point into the blocks, drop them before unlinking.
+        self.height_maps = self.terrain = None
+        for block in (self.heights_block, self.terrain_block):
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Seeds for num_worlds worlds from one master seed. World i always gets the
+# same seed, and it can be passed to WorldGenerator to rebuild just that world.
+def spawn_world_seeds(master_seed, num_worlds):
+    children = np.random.SeedSequence(master_seed).spawn(num_worlds)
+    # A 0 seed would be treated as "no seed", hence the `or 1`
+    return [int(child.generate_state(1, np.uint64)[0]) or 1 for child in children]
+
+
+def farm_worlds(user_params_list, map_size, master_seed, roughness=0.5, max_workers=None, batch_size=16):
+    width, height = map_dimensions(map_size)
+    seeds = spawn_world_seeds(master_seed, len(user_params_list))
+    result = FarmResult(seeds, (len(user_params_list), height, width))
+    print(f"Farming {len(user_params_list)} worlds ({width}x{height}) on {max_workers or os.cpu_count()} workers")
+
+    tasks = []
+    for start in range(0, len(user_params_list), batch_size):
+        world_specs = list(zip(user_params_list[start:start + batch_size], seeds[start:start + batch_size]))
+        tasks.append((result.heights_block.name, result.terrain_block.name, result.height_maps.shape,
+                      start, world_specs, roughness))
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for failed in pool.map(farm_batch, tasks):
+                for index in failed:
+                    print(f"Error: World {index} could not be generated.")
+                result.failed.extend(failed)
+    except BaseException:
+        result.close()
+        raise
+    return result
+
+
+# Runs in a worker: generates one batch of worlds and writes it into the shared
+# blocks. Returns the indexes of the worlds that couldn't be generated, the rest
+# of the batch is still made (every world has its own rng, so leaving one out
+# doesn't change the others).
+def farm_batch(task):
+    heights_name, terrain_name, shape, start, world_specs, roughness = task
+    map_size = (shape[2], shape[1])
+    indexes, biome_masks, seeds, failed = [], [], [], []
+    with contextlib.redirect_stdout(io.StringIO()): # keep the workers quiet
+        for index, (user_params, seed) in enumerate(world_specs, start):
+            biome_mask = create_biome_mask(map_size, user_params)
+            if biome_mask is None:
+                failed.append(index)
+                continue
+            indexes.append(index)
+            biome_masks.append(biome_mask)
+            seeds.append(seed)
+        if not indexes:
+            return failed
+        _, smoothed_hms, terrain = generate_mask_stack(np.stack(biome_masks), seeds, roughness)
+
+    heights_block = shared_memory.SharedMemory(name=heights_name)
+    terrain_block = shared_memory.SharedMemory(name=terrain_name)
+    try:
+        np.ndarray(shape, dtype=np.float64, buffer=heights_block.buf)[indexes] = smoothed_hms
+        np.ndarray(shape, dtype=np.uint8, buffer=terrain_block.buf)[indexes] = terrain
+    finally:
+        heights_block.close()
+        terrain_block.close()
+    return failed
+
+
+if __name__ == "__main__":
+    user_params_list = [{'north': 'water', 'south': 'mountains'}, {'center': 'forest', 'east': 'desert'}] * 50
+    with farm_worlds(user_params_list, MapSizes.LARGE_MAP, master_seed=42) as farm:
+        print(f"Generated {len(farm.seeds) - len(farm.failed)} worlds, first seed = {farm.seeds[0]}")
+        print_tilemap(farm.ascii_world(0))